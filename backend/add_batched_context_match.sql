@@ -0,0 +1,127 @@
+-- Migration: Batched match functions for selection-context search
+-- Run this script in your Supabase SQL Editor
+--
+-- The context search used to issue one match RPC per note/document, paying a
+-- round-trip per parent row. These variants take the whole id set at once and
+-- keep the per-parent limit with a window function, so one call replaces N.
+
+CREATE OR REPLACE FUNCTION match_handwriting_chunks_for_notes(
+    query_embedding VECTOR(1536),
+    note_ids UUID[],
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count_per_note INT DEFAULT 5
+)
+RETURNS TABLE (
+    id UUID,
+    note_id UUID,
+    chunk_text TEXT,
+    similarity FLOAT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT ranked.id, ranked.note_id, ranked.chunk_text, ranked.similarity, ranked.metadata
+    FROM (
+        SELECT
+            hc.id,
+            hc.note_id,
+            hc.chunk_text,
+            1 - (hc.embedding <=> query_embedding) AS similarity,
+            hc.metadata,
+            ROW_NUMBER() OVER (
+                PARTITION BY hc.note_id
+                ORDER BY hc.embedding <=> query_embedding
+            ) AS rank
+        FROM handwriting_chunks hc
+        WHERE hc.note_id = ANY(note_ids)
+          AND 1 - (hc.embedding <=> query_embedding) > match_threshold
+    ) ranked
+    WHERE ranked.rank <= match_count_per_note
+    ORDER BY ranked.similarity DESC;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_typed_note_chunks_for_notes(
+    query_embedding VECTOR(1536),
+    note_ids UUID[],
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count_per_note INT DEFAULT 5
+)
+RETURNS TABLE (
+    id UUID,
+    note_id UUID,
+    chunk_text TEXT,
+    similarity FLOAT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT ranked.id, ranked.note_id, ranked.chunk_text, ranked.similarity, ranked.metadata
+    FROM (
+        SELECT
+            tnc.id,
+            tnc.note_id,
+            tnc.chunk_text,
+            1 - (tnc.embedding <=> query_embedding) AS similarity,
+            tnc.metadata,
+            ROW_NUMBER() OVER (
+                PARTITION BY tnc.note_id
+                ORDER BY tnc.embedding <=> query_embedding
+            ) AS rank
+        FROM typed_note_chunks tnc
+        WHERE tnc.note_id = ANY(note_ids)
+          AND 1 - (tnc.embedding <=> query_embedding) > match_threshold
+    ) ranked
+    WHERE ranked.rank <= match_count_per_note
+    ORDER BY ranked.similarity DESC;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_pdf_chunks_for_documents(
+    query_embedding VECTOR(1536),
+    document_ids UUID[],
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count_per_document INT DEFAULT 5
+)
+RETURNS TABLE (
+    id UUID,
+    document_id UUID,
+    chunk_text TEXT,
+    page_number INTEGER,
+    similarity FLOAT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT ranked.id, ranked.document_id, ranked.chunk_text, ranked.page_number,
+           ranked.similarity, ranked.metadata
+    FROM (
+        SELECT
+            pc.id,
+            pc.document_id,
+            pc.chunk_text,
+            pc.page_number,
+            1 - (pc.embedding <=> query_embedding) AS similarity,
+            pc.metadata,
+            ROW_NUMBER() OVER (
+                PARTITION BY pc.document_id
+                ORDER BY pc.embedding <=> query_embedding
+            ) AS rank
+        FROM pdf_chunks pc
+        WHERE pc.document_id = ANY(document_ids)
+          AND 1 - (pc.embedding <=> query_embedding) > match_threshold
+    ) ranked
+    WHERE ranked.rank <= match_count_per_document
+    ORDER BY ranked.similarity DESC;
+END;
+$$;
+
+COMMENT ON FUNCTION match_handwriting_chunks_for_notes IS 'Batched semantic search over many handwriting notes in one call';
+COMMENT ON FUNCTION match_typed_note_chunks_for_notes IS 'Batched semantic search over many typed notes in one call';
+COMMENT ON FUNCTION match_pdf_chunks_for_documents IS 'Batched semantic search over many PDF documents in one call';
@@ -0,0 +1,69 @@
+-- Migration: Wider candidate over-fetch for document-filtered PDF search
+-- Run this script in your Supabase SQL Editor (after add_hnsw_ef_search.sql)
+--
+-- When filter_document_id is set, the HNSW traversal discards every candidate
+-- belonging to other documents, so a 4x over-fetch can leave fewer than
+-- match_count survivors (recall starvation). Filtered searches now pull a 12x
+-- candidate pool; unfiltered searches keep the cheaper 4x. The index scan
+-- itself yields at most hnsw.ef_search rows before the document filter
+-- applies, so filtered calls also force ef_search up to cover the 12x pool —
+-- without that the wider LIMIT is never reached.
+
+CREATE OR REPLACE FUNCTION match_pdf_chunks(
+    query_embedding VECTOR(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    filter_document_id UUID DEFAULT NULL,
+    ef_search INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    document_id UUID,
+    chunk_text TEXT,
+    page_number INTEGER,
+    similarity FLOAT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    effective_ef INT := ef_search;
+BEGIN
+    IF filter_document_id IS NOT NULL THEN
+        -- The filter is applied after the index scan, which returns at most
+        -- hnsw.ef_search candidates; widen the beam so the 12x pool below can
+        -- actually fill up with rows from the target document.
+        effective_ef := GREATEST(COALESCE(effective_ef, 0), match_count * 12);
+    END IF;
+    IF effective_ef IS NOT NULL THEN
+        -- Transaction-local, so concurrent queries keep their own setting
+        PERFORM set_config('hnsw.ef_search', effective_ef::text, true);
+    END IF;
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT
+            pdf_chunks.id,
+            pdf_chunks.document_id,
+            pdf_chunks.chunk_text,
+            pdf_chunks.page_number,
+            pdf_chunks.embedding,
+            pdf_chunks.metadata
+        FROM pdf_chunks
+        WHERE (filter_document_id IS NULL OR pdf_chunks.document_id = filter_document_id)
+        ORDER BY pdf_chunks.embedding_half <=> (query_embedding::halfvec(1536))
+        LIMIT match_count * CASE WHEN filter_document_id IS NULL THEN 4 ELSE 12 END
+    )
+    SELECT
+        candidates.id,
+        candidates.document_id,
+        candidates.chunk_text,
+        candidates.page_number,
+        1 - (candidates.embedding <=> query_embedding) AS similarity,
+        candidates.metadata
+    FROM candidates
+    WHERE 1 - (candidates.embedding <=> query_embedding) > match_threshold
+    ORDER BY candidates.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
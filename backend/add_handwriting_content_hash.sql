@@ -0,0 +1,10 @@
+-- Migration: Add content-hash dedup for handwriting uploads
+-- Run this script in your Supabase SQL Editor
+
+-- SHA-256 fingerprint of the uploaded image bytes; used to skip re-upload
+-- and re-OCR of identical snapshots
+ALTER TABLE handwriting_notes ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_handwriting_notes_content_hash ON handwriting_notes(content_hash);
+
+COMMENT ON COLUMN handwriting_notes.content_hash IS 'SHA-256 of the uploaded image bytes, used for duplicate detection';
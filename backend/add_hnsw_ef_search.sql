@@ -0,0 +1,61 @@
+-- Migration: Tunable HNSW ef_search for PDF chunk matching
+-- Run this script in your Supabase SQL Editor (after add_quantized_embeddings.sql)
+--
+-- ef_search controls how many candidates the HNSW traversal keeps per query:
+-- lower is faster, higher recalls more. Exposing it as a function parameter
+-- lets callers trade recall for latency per request instead of relying on
+-- the database default.
+
+-- Drop the old signature so named-argument RPC calls stay unambiguous
+DROP FUNCTION IF EXISTS match_pdf_chunks(VECTOR, FLOAT, INT, UUID);
+
+CREATE OR REPLACE FUNCTION match_pdf_chunks(
+    query_embedding VECTOR(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    filter_document_id UUID DEFAULT NULL,
+    ef_search INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    document_id UUID,
+    chunk_text TEXT,
+    page_number INTEGER,
+    similarity FLOAT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF ef_search IS NOT NULL THEN
+        -- Transaction-local, so concurrent queries keep their own setting
+        PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+    END IF;
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT
+            pdf_chunks.id,
+            pdf_chunks.document_id,
+            pdf_chunks.chunk_text,
+            pdf_chunks.page_number,
+            pdf_chunks.embedding,
+            pdf_chunks.metadata
+        FROM pdf_chunks
+        WHERE (filter_document_id IS NULL OR pdf_chunks.document_id = filter_document_id)
+        ORDER BY pdf_chunks.embedding_half <=> (query_embedding::halfvec(1536))
+        LIMIT match_count * 4
+    )
+    SELECT
+        candidates.id,
+        candidates.document_id,
+        candidates.chunk_text,
+        candidates.page_number,
+        1 - (candidates.embedding <=> query_embedding) AS similarity,
+        candidates.metadata
+    FROM candidates
+    WHERE 1 - (candidates.embedding <=> query_embedding) > match_threshold
+    ORDER BY candidates.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,10 @@
+-- Migration: Add content-hash dedup for PDF uploads
+-- Run this script in your Supabase SQL Editor
+
+-- SHA-256 fingerprint of the raw PDF bytes; used to skip reprocessing
+-- identical uploads (no re-parse, no re-embedding)
+ALTER TABLE pdf_documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_pdf_documents_content_hash ON pdf_documents(content_hash);
+
+COMMENT ON COLUMN pdf_documents.content_hash IS 'SHA-256 of the uploaded PDF bytes, used for duplicate detection';
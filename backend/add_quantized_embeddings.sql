@@ -0,0 +1,63 @@
+-- Migration: Quantized embeddings for bandwidth-bound similarity search
+-- Run this script in your Supabase SQL Editor (requires pgvector >= 0.7)
+--
+-- HNSW traversal is memory-bandwidth-bound over the vector table. Keeping a
+-- half-precision (fp16) copy of each embedding halves the bytes moved during
+-- the ANN scan; the full float copy stays in place for exact re-ranking.
+
+-- Generated column keeps the quantized copy in sync automatically
+ALTER TABLE pdf_chunks
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(1536)
+    GENERATED ALWAYS AS ((embedding::halfvec(1536))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_pdf_chunks_embedding_half ON pdf_chunks
+USING hnsw (embedding_half halfvec_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- First-pass ANN over the fp16 index, exact fp32 re-rank of the candidates
+CREATE OR REPLACE FUNCTION match_pdf_chunks(
+    query_embedding VECTOR(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    filter_document_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    document_id UUID,
+    chunk_text TEXT,
+    page_number INTEGER,
+    similarity FLOAT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT
+            pdf_chunks.id,
+            pdf_chunks.document_id,
+            pdf_chunks.chunk_text,
+            pdf_chunks.page_number,
+            pdf_chunks.embedding,
+            pdf_chunks.metadata
+        FROM pdf_chunks
+        WHERE (filter_document_id IS NULL OR pdf_chunks.document_id = filter_document_id)
+        ORDER BY pdf_chunks.embedding_half <=> (query_embedding::halfvec(1536))
+        LIMIT match_count * 4
+    )
+    SELECT
+        candidates.id,
+        candidates.document_id,
+        candidates.chunk_text,
+        candidates.page_number,
+        1 - (candidates.embedding <=> query_embedding) AS similarity,
+        candidates.metadata
+    FROM candidates
+    WHERE 1 - (candidates.embedding <=> query_embedding) > match_threshold
+    ORDER BY candidates.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+COMMENT ON COLUMN pdf_chunks.embedding_half IS 'fp16 copy of embedding; halves bandwidth for the ANN first pass';
@@ -3,7 +3,9 @@ Embed tool for creating Google Maps and YouTube embeds.
 """
 import os
 import logging
+import urllib.parse
 from typing import Optional, Dict, Any
+from cachetools import TTLCache
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
@@ -23,6 +25,10 @@ class EmbedTool:
         """
         self.google_maps_api_key = google_maps_api_key or os.getenv("GOOGLE_MAPS_API_KEY")
         self.youtube_api_key = youtube_api_key or os.getenv("YOUTUBE_API_KEY")
+
+        # YouTube search results are stable enough to cache for a day; repeat
+        # queries skip the rate-limited Data API entirely
+        self._youtube_search_cache: TTLCache = TTLCache(maxsize=1024, ttl=86400)
         
         # Check if APIs are configured
         self.google_maps_enabled = bool(self.google_maps_api_key)
@@ -58,16 +64,17 @@ class EmbedTool:
         if not self.google_maps_enabled:
             logger.warning("Google Maps API key not configured")
             return None
-        
-        # Build the embed URL
+
+        # Build the embed URL with proper escaping (queries may contain '&', spaces, etc.)
         base_url = "https://www.google.com/maps/embed/v1/search"
-        params = f"key={self.google_maps_api_key}&q={query}"
-        
+        params = {"key": self.google_maps_api_key, "q": query}
+
         # Add center coordinates if provided
         if lat is not None and lng is not None:
-            params += f"&center={lat},{lng}&zoom=14"
-        
-        embed_url = f"{base_url}?{params}"
+            params["center"] = f"{lat},{lng}"
+            params["zoom"] = 14
+
+        embed_url = f"{base_url}?{urllib.parse.urlencode(params)}"
         logger.info(f"Created Google Maps embed for query: {query}")
         return embed_url
     
@@ -89,7 +96,13 @@ class EmbedTool:
         if not hasattr(self, 'youtube_service') or self.youtube_service is None:
             logger.warning("YouTube service not initialized, will use search embed fallback")
             return None
-        
+
+        cache_key = " ".join(query.lower().split())
+        cached_id = self._youtube_search_cache.get(cache_key)
+        if cached_id is not None:
+            logger.info(f"YouTube search cache hit for query: {query}")
+            return cached_id
+
         try:
             # Search for videos
             search_response = self.youtube_service.search().list(
@@ -106,6 +119,7 @@ class EmbedTool:
                 video_id = search_response["items"][0]["id"]["videoId"]
                 video_title = search_response["items"][0]["snippet"]["title"]
                 logger.info(f"Found YouTube video: {video_title} (ID: {video_id})")
+                self._youtube_search_cache[cache_key] = video_id
                 return video_id
             else:
                 logger.warning(f"No YouTube results found for query: {query}")
@@ -150,7 +164,6 @@ class EmbedTool:
         Returns:
             YouTube embed URL (may show related content or require user interaction)
         """
-        import urllib.parse
         encoded_query = urllib.parse.quote_plus(query)
         # Create a YouTube URL that can be used for search
         # Since YouTube search pages can't be embedded, we'll use
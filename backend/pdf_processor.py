@@ -3,17 +3,27 @@ PDF Processing Module
 Handles PDF text extraction, chunking, embedding generation, and Supabase storage
 """
 
+import asyncio
+import hashlib
 import os
 import uuid
+from dataclasses import dataclass
 from io import BytesIO
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Union
 from datetime import datetime, timezone
-import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import httpx
 import pdfplumber
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
 from openai import OpenAI
 from supabase import create_client, Client
 # from emergentintegrations.llm.utils import get_integration_proxy_url
 import logging
+import numpy as np
+import orjson
 from PIL import Image, ImageEnhance, ImageFilter
 import pytesseract
 from pytesseract import Output
@@ -23,6 +33,16 @@ import unicodedata
 
 logger = logging.getLogger(__name__)
 
+# Precompiled whitespace collapser shared by the text-cleaning hot path
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _as_float_list(vec) -> List[float]:
+    """Convert an embedding row to a plain list at the JSON boundary."""
+    if isinstance(vec, np.ndarray):
+        return vec.tolist()
+    return vec
+
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -64,119 +84,325 @@ def sanitize_filename(filename: str) -> str:
     return filename
 
 
+def _extract_page_range(args: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    """
+    Worker for process-pool extraction: open the PDF in the child process
+    and extract a contiguous range of pages. Module-level so it can be pickled.
+    """
+    pdf_path, start, end = args
+    extractor = PDFExtractor()
+    results = []
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(start, end):
+            text = extractor._clean_text(doc[page_num].get_text("text"))
+            results.append((page_num + 1, text))
+    finally:
+        doc.close()
+    return results
+
+
 class PDFExtractor:
-    """Extract text from PDF files using pdfplumber"""
-    
+    """Extract text from PDF files using PyMuPDF (pdfplumber fallback)"""
+
+    # Below this page count the process-pool spawn cost outweighs the win
+    PARALLEL_PAGE_THRESHOLD = 16
+    # Window size for the pdfplumber fallback so pdfminer state is released
+    # between windows instead of accumulating for the whole document
+    PDFPLUMBER_WINDOW_PAGES = 50
+
+    # Minimum characters across the sampled pages for a PDF to count as born-digital
+    BORN_DIGITAL_MIN_CHARS = 50
+    BORN_DIGITAL_SAMPLE_PAGES = 3
+
     def __init__(self):
         self.logger = logging.getLogger(__name__ + '.PDFExtractor')
-    
+
+    def is_born_digital(self, pdf_path: str) -> bool:
+        """
+        Cheap detector for image-only (scanned) PDFs: sample the first few
+        pages and check whether any extractable text exists. Scanned PDFs
+        return empty strings from the text extractor, so running the full
+        parse + chunk + embed pipeline on them is wasted work — they need
+        an OCR pass instead.
+        """
+        if fitz is None:
+            # pdfplumber sampling would cost nearly as much as full extraction
+            return True
+
+        doc = fitz.open(pdf_path)
+        try:
+            sample = min(self.BORN_DIGITAL_SAMPLE_PAGES, doc.page_count)
+            total_chars = sum(len(doc[i].get_text("text").strip()) for i in range(sample))
+        finally:
+            doc.close()
+
+        if total_chars < self.BORN_DIGITAL_MIN_CHARS:
+            self.logger.info(
+                "PDF %s looks image-only (%d chars in first %d pages)",
+                pdf_path, total_chars, sample,
+            )
+            return False
+        return True
+
     def extract_text_by_page(self, pdf_path: str) -> Dict[int, str]:
         """
         Extract text from PDF, organized by page number.
         Returns: Dict with page numbers as keys and extracted text as values
         """
+        page_texts = dict(self.iter_page_texts(pdf_path))
+        self.logger.info(f"Total pages extracted: {len(page_texts)}")
+        return page_texts
+
+    def iter_page_texts(self, pdf_path: str):
+        """
+        Yield (page_number, cleaned_text) pairs as pages are parsed, so
+        downstream stages can start before the whole document is done.
+        Uses PyMuPDF's C-backed parser (orders of magnitude faster than
+        pdfplumber per page); falls back to pdfplumber if PyMuPDF is missing.
+        Large documents are split across a process pool since page parsing
+        is CPU-bound and independent per page.
+        """
         self.logger.info(f"Extracting text from: {pdf_path}")
-        page_texts = {}
-        
+
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text() or ""
-                    text = self._clean_text(text)
-                    page_texts[page_num + 1] = text
-                    self.logger.debug(f"Page {page_num + 1}: extracted {len(text)} characters")
-                
-                self.logger.info(f"Total pages extracted: {len(page_texts)}")
-                return page_texts
-                
+            if fitz is not None:
+                doc = fitz.open(pdf_path)
+                try:
+                    page_count = doc.page_count
+                    if page_count >= self.PARALLEL_PAGE_THRESHOLD:
+                        doc.close()
+                        yield from self._iter_parallel(pdf_path, page_count)
+                        return
+                    for page_num, page in enumerate(doc):
+                        text = self._clean_text(page.get_text("text"))
+                        self.logger.debug(f"Page {page_num + 1}: extracted {len(text)} characters")
+                        yield page_num + 1, text
+                finally:
+                    if not doc.is_closed:
+                        doc.close()
+            else:
+                yield from self._iter_pdfplumber(pdf_path)
+
         except Exception as e:
             self.logger.error(f"Error extracting PDF: {e}")
             raise
-    
+
+    def _iter_pdfplumber(self, pdf_path: str):
+        """
+        pdfplumber fallback. Pages are opened in fixed-size windows and the
+        pdf object is dropped between windows, releasing pdfminer's per-page
+        state so memory stays flat on 1000+ page documents.
+        """
+        with pdfplumber.open(pdf_path) as pdf:
+            total_pages = len(pdf.pages)
+
+        window = self.PDFPLUMBER_WINDOW_PAGES
+        for window_start in range(1, total_pages + 1, window):
+            pages = list(range(window_start, min(window_start + window, total_pages + 1)))
+            with pdfplumber.open(pdf_path, pages=pages) as pdf:
+                for page in pdf.pages:
+                    # Raw char stream instead of extract_text(): skips the
+                    # line-clustering layout pass (most of the per-page cost).
+                    # Chunking is character-based, so exact line breaks don't
+                    # matter and _clean_text normalizes whitespace anyway.
+                    text = "".join(c["text"] for c in page.chars)
+                    text = self._clean_text(text)
+                    self.logger.debug(f"Page {page.page_number}: extracted {len(text)} characters")
+                    yield page.page_number, text
+
+    def _iter_parallel(self, pdf_path: str, page_count: int):
+        """Extract pages across all cores, yielding ranges as workers finish them."""
+        workers = min(os.cpu_count() or 1, page_count)
+        pages_per_worker = -(-page_count // workers)  # ceil division
+        ranges = [
+            (pdf_path, start, min(start + pages_per_worker, page_count))
+            for start in range(0, page_count, pages_per_worker)
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch in executor.map(_extract_page_range, ranges):
+                yield from batch
+
+        self.logger.info(f"Total pages extracted (parallel, {workers} workers): {page_count}")
+
+    # Drops NUL and replacement chars in the same pass as whitespace collapsing
+    _TRANSLATE_TABLE = str.maketrans({"\x00": None, "\ufffd": None})
+
     def _clean_text(self, text: str) -> str:
-        """Clean extracted text by removing excessive whitespace"""
-        text = " ".join(text.split())
-        text = text.replace("\x00", "")
-        text = text.replace("\ufffd", "")
-        return text.strip()
+        """Clean extracted text by removing artifacts and excessive whitespace"""
+        text = text.translate(self._TRANSLATE_TABLE)
+        return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+@dataclass(slots=True)
+class Chunk:
+    """One text chunk with its position metadata, ready for embedding."""
+    text: str
+    page_number: int
+    chunk_index: int
+    char_start: int
+    char_end: int
 
 
 class TextChunker:
     """Chunk text into overlapping segments for embedding"""
-    
+
     def __init__(self, chunk_size: int = 1000, overlap: int = 200):
         self.chunk_size = chunk_size
         self.overlap = overlap
         self.logger = logging.getLogger(__name__ + '.TextChunker')
-    
-    def chunk_text(self, text: str, page_number: int) -> List[Dict]:
+
+    def chunk_text(self, text: str, page_number: int) -> List[Chunk]:
         """
         Split text into overlapping chunks with metadata.
-        Returns: List of dicts with chunk text and metadata
+        Chunk boundaries are precomputed as NumPy arrays instead of advancing
+        a Python-level loop counter, so the per-chunk work is a single slice.
+        Returns: List of Chunk records (slotted dataclass — noticeably
+        lighter than per-chunk dicts on 10k-chunk documents)
         """
+        if not text:
+            return []
+
+        step = self.chunk_size - self.overlap
+        starts = np.arange(0, len(text), step)
+        ends = starts + self.chunk_size
+
         chunks = []
-        start = 0
         chunk_index = 0
-        
-        while start < len(text):
-            end = start + self.chunk_size
+        for start, end in zip(starts.tolist(), ends.tolist()):
             chunk_text = text[start:end]
-            
+
             # Only include chunks that have meaningful content
             if len(chunk_text.strip()) > 50:
-                chunks.append({
-                    'text': chunk_text,
-                    'page_number': page_number,
-                    'chunk_index': chunk_index,
-                    'char_start': start,
-                    'char_end': end
-                })
+                chunks.append(Chunk(
+                    text=chunk_text,
+                    page_number=page_number,
+                    chunk_index=chunk_index,
+                    char_start=start,
+                    char_end=end,
+                ))
                 chunk_index += 1
-            
-            start += (self.chunk_size - self.overlap)
-        
+
         return chunks
 
 
 class EmbeddingGenerator:
     """Generate embeddings using OpenAI API"""
     
-    def __init__(self, api_key: str, model: str = "text-embedding-3-small", base_url: str = None):
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small", base_url: str = None, dimensions: Optional[int] = None):
         self.model = model
         self.api_key = api_key
+        # text-embedding-3-* models can return truncated vectors (e.g. 512)
+        # with little retrieval quality loss — smaller vectors mean less
+        # storage, less payload, and faster pgvector scans. Must match the
+        # VECTOR(n) column dimension in the Supabase schema.
+        if dimensions is None:
+            env_dims = os.getenv("EMBEDDING_DIMENSIONS")
+            dimensions = int(env_dims) if env_dims else None
+        self.dimensions = dimensions
         self.logger = logging.getLogger(__name__ + '.EmbeddingGenerator')
-        
-        # Initialize OpenAI client (direct to OpenAI API)
-        self.client = OpenAI(api_key=api_key)
-        self.logger.info(f"Initialized with OpenAI API for embeddings")
+
+        # Initialize OpenAI client (direct to OpenAI API) over a shared
+        # HTTP/2 pool: concurrent batches multiplex one warm connection
+        # instead of paying TCP/TLS setup per request, and keepalives cover
+        # the full MAX_CONCURRENT_BATCHES fan-out
+        http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+            timeout=60.0,
+        )
+        self.client = OpenAI(api_key=api_key, http_client=http_client)
+        self.logger.info(
+            "Initialized with OpenAI API for embeddings"
+            + (f" ({dimensions} dimensions)" if dimensions else "")
+        )
     
-    def generate_embeddings(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+    # Bounded concurrency keeps us clear of OpenAI rate limits while
+    # overlapping the per-batch HTTP round-trips
+    MAX_CONCURRENT_BATCHES = 5
+    # Keep each request under the API's 8192-token / 2048-item batch limits
+    MAX_BATCH_TOKENS = 7500
+
+    def generate_embeddings(self, texts: List[str], batch_size: int = 512) -> np.ndarray:
         """
-        Generate embeddings for a list of texts in batches using OpenAI via Emergent proxy.
-        Returns: List of embedding vectors
+        Generate embeddings for a list of texts, dispatching batches
+        concurrently since the workload is network-latency-bound.
+        Batches are packed up to a token budget rather than a fixed item
+        count, which amortizes per-request HTTP overhead over more inputs.
+        Inputs are packed in length order so each batch holds similarly
+        sized texts (tighter packing against the token budget), then results
+        are scattered back to input order.
+        Returns: float32 ndarray of shape (len(texts), dims) in input order —
+        ~7x less heap than nested Python float lists, and contiguous for
+        any local vector math. Convert rows with .tolist() at JSON boundaries.
         """
-        all_embeddings = []
-        
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            self.logger.info(f"Generating embeddings for batch {i//batch_size + 1} ({len(batch)} texts)")
-            
-            try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
-                )
-                
-                batch_embeddings = [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
-                all_embeddings.extend(batch_embeddings)
-                
-                self.logger.info(f"Generated {len(batch_embeddings)} embeddings, tokens used: {response.usage.total_tokens}")
-                
-            except Exception as e:
-                self.logger.error(f"Error generating embeddings: {e}")
-                raise
-        
-        return all_embeddings
+        if not texts:
+            return np.empty((0, self.dimensions or 1536), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = self._pack_batches([texts[i] for i in order], batch_size)
+
+        if len(batches) == 1:
+            stacked = self._embed_batch(batches[0], 1)
+        else:
+            results: List[Optional[np.ndarray]] = [None] * len(batches)
+            workers = min(self.MAX_CONCURRENT_BATCHES, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._embed_batch, batch, idx + 1): idx
+                    for idx, batch in enumerate(batches)
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+            stacked = np.vstack(results)
+
+        embeddings = np.empty_like(stacked)
+        embeddings[order] = stacked
+        return embeddings
+
+    def _pack_batches(self, texts: List[str], batch_size: int) -> List[List[str]]:
+        """
+        Greedily pack texts into batches bounded by both an item count and an
+        estimated token budget (~4 chars/token heuristic).
+        """
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+
+        for text in texts:
+            est_tokens = max(1, len(text) // 4)
+            if current and (len(current) >= batch_size or current_tokens + est_tokens > self.MAX_BATCH_TOKENS):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(text)
+            current_tokens += est_tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, batch: List[str], batch_num: int) -> np.ndarray:
+        """Issue a single embeddings request for one batch of texts."""
+        self.logger.info(f"Generating embeddings for batch {batch_num} ({len(batch)} texts)")
+        try:
+            params = {"model": self.model, "input": batch}
+            if self.dimensions:
+                params["dimensions"] = self.dimensions
+            response = self.client.embeddings.create(**params)
+
+            # The embeddings endpoint returns items in input order; no need to
+            # re-sort by index on every batch
+            batch_embeddings = np.asarray(
+                [item.embedding for item in response.data], dtype=np.float32
+            )
+            self.logger.info(f"Generated {len(batch_embeddings)} embeddings, tokens used: {response.usage.total_tokens}")
+            return batch_embeddings
+
+        except Exception as e:
+            self.logger.error(f"Error generating embeddings: {e}")
+            raise
 
 
 class SupabaseRAGStorage:
@@ -184,6 +410,7 @@ class SupabaseRAGStorage:
     
     def __init__(self, supabase_url: str, supabase_key: str):
         self.client: Client = create_client(supabase_url, supabase_key)
+        self.supabase_url = (supabase_url or "").rstrip("/")
         self.bucket_name = "pdfs"
         self.handwriting_bucket = os.getenv("HANDWRITING_BUCKET", "handwriting")
         self.logger = logging.getLogger(__name__ + '.SupabaseRAGStorage')
@@ -219,49 +446,43 @@ class SupabaseRAGStorage:
         image_bytes: bytes,
         filename: str,
         content_type: str = "image/png",
+        storage_path: Optional[str] = None,
     ) -> str:
         """
         Upload handwriting snapshot to Supabase Storage.
+        Callers may pass a precomputed storage_path so dependent work (e.g.
+        the metadata insert) can run concurrently with the upload.
         Returns: Storage path of uploaded file
         """
-        # Sanitize the filename to remove special characters
-        sanitized_filename = sanitize_filename(filename)
-        storage_path = f"{uuid.uuid4()}/{sanitized_filename}"
+        if storage_path is None:
+            # Sanitize the filename to remove special characters
+            sanitized_filename = sanitize_filename(filename)
+            storage_path = f"{uuid.uuid4()}/{sanitized_filename}"
 
-        self.logger.info(f"Uploading handwriting image: {filename} -> {sanitized_filename}")
+        self.logger.info(f"Uploading handwriting image: {filename} -> {storage_path}")
 
-        tmp_file = tempfile.NamedTemporaryFile(delete=False)
         try:
-            tmp_file.write(image_bytes)
-            tmp_file.flush()
-            tmp_file.close()
-
-            with open(tmp_file.name, 'rb') as f:
-                self.client.storage.from_(self.handwriting_bucket).upload(
-                    path=storage_path,
-                    file=f,
-                    file_options={"content-type": content_type}
-                )
+            # The bytes are already in memory; hand them straight to the
+            # storage client instead of round-tripping through a temp file
+            self.client.storage.from_(self.handwriting_bucket).upload(
+                path=storage_path,
+                file=bytes(image_bytes),
+                file_options={"content-type": content_type}
+            )
             self.logger.info(f"Uploaded handwriting image to: {storage_path}")
             return storage_path
         except Exception as e:
             self.logger.error(f"Error uploading handwriting image: {e}")
             raise
-        finally:
-            try:
-                os.unlink(tmp_file.name)
-            except OSError:
-                pass
 
     def get_public_url(self, storage_path: str, bucket: Optional[str] = None) -> str:
-        """Get public URL for a file in storage"""
+        """
+        Get public URL for a file in storage.
+        The URL is deterministic from project URL + bucket + path, so it is
+        built locally instead of going through the storage client.
+        """
         target_bucket = bucket or self.bucket_name
-        try:
-            result = self.client.storage.from_(target_bucket).get_public_url(storage_path)
-            return result
-        except Exception as e:
-            self.logger.error(f"Error getting public URL: {e}")
-            raise
+        return f"{self.supabase_url}/storage/v1/object/public/{target_bucket}/{storage_path}"
 
     def insert_handwriting_note(
         self,
@@ -272,7 +493,8 @@ class SupabaseRAGStorage:
         page_bounds: Optional[Dict],
         group_id: Optional[str],
         metadata: Optional[Dict] = None,
-        status: str = "pending"
+        status: str = "pending",
+        content_hash: Optional[str] = None,
     ) -> str:
         """
         Insert handwriting note metadata.
@@ -299,6 +521,8 @@ class SupabaseRAGStorage:
             payload["page_bounds"] = page_bounds
         if group_id is not None:
             payload["group_id"] = group_id
+        if content_hash is not None:
+            payload["content_hash"] = content_hash
 
         try:
             response = self.client.table("handwriting_notes").insert(payload).execute()
@@ -344,11 +568,11 @@ class SupabaseRAGStorage:
             self.logger.error(f"Error updating handwriting note {note_id}: {e}", exc_info=True)
             raise
 
-    def insert_handwriting_chunks(self, note_id: str, chunks: List[Dict], embeddings: List[List[float]]) -> int:
+    def insert_handwriting_chunks(self, note_id: str, chunks: List[Dict], embeddings: np.ndarray) -> int:
         """
         Insert OCR chunks with embeddings into handwriting_chunks table.
         """
-        if not chunks or not embeddings:
+        if not chunks or len(embeddings) == 0:
             return 0
 
         rows = []
@@ -357,7 +581,7 @@ class SupabaseRAGStorage:
                 "note_id": note_id,
                 "chunk_index": chunk["chunk_index"],
                 "chunk_text": chunk["text"],
-                "embedding": embedding,
+                "embedding": _as_float_list(embedding),
                 "metadata": {
                     "char_start": chunk["char_start"],
                     "char_end": chunk["char_end"],
@@ -378,7 +602,97 @@ class SupabaseRAGStorage:
             self.logger.error(f"Error inserting handwriting chunks: {e}", exc_info=True)
             raise
 
-    def insert_document(self, filename: str, storage_path: str, page_count: int, file_size: int) -> str:
+    def find_handwriting_note_by_hash(self, content_hash: str) -> Optional[Dict]:
+        """Look up a previously uploaded handwriting note by its content fingerprint.
+
+        Only notes whose pipeline ran (or is still running) count as duplicates:
+        a failed or superseded note never got its chunks indexed, and
+        re-uploading the same image is how users retry — that upload must fall
+        through to a fresh OCR pass instead of short-circuiting forever.
+        """
+        try:
+            response = (
+                self.client.table("handwriting_notes")
+                .select("*")
+                .eq("content_hash", content_hash)
+                .in_("status", ["processing", "processed", "no_text"])
+                .limit(1)
+                .execute()
+            )
+            if response.data:
+                return response.data[0]
+            return None
+        except APIError as e:
+            # content_hash column may not exist yet on older schemas
+            error_message = getattr(e, "message", str(e))
+            if e.code == "42703" or "content_hash" in error_message:
+                self.logger.warning("content_hash column missing, skipping dedup lookup: %s", e)
+                return None
+            self.logger.error(f"Error looking up handwriting note by hash: {e}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Error looking up handwriting note by hash: {e}")
+            raise
+
+    def find_document_by_hash(self, content_hash: str) -> Optional[Dict]:
+        """Look up a previously processed document by its content fingerprint."""
+        try:
+            response = (
+                self.client.table("pdf_documents")
+                .select("*")
+                .eq("content_hash", content_hash)
+                .limit(1)
+                .execute()
+            )
+            if response.data:
+                return response.data[0]
+            return None
+        except APIError as e:
+            # content_hash column may not exist yet on older schemas
+            error_message = getattr(e, "message", str(e))
+            if e.code == "42703" or "content_hash" in error_message:
+                self.logger.warning("content_hash column missing, skipping dedup lookup: %s", e)
+                return None
+            self.logger.error(f"Error looking up document by hash: {e}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Error looking up document by hash: {e}")
+            raise
+
+    def _insert_rows(self, table: str, rows: List[Dict]) -> None:
+        """
+        Insert rows, serializing the payload with orjson when possible.
+        Chunk batches carry megabytes of embedding floats; orjson encodes
+        numeric lists several times faster than the stdlib encoder the
+        client uses. Falls back to the regular insert path only when the
+        raw request provably wrote nothing; an ambiguous failure (e.g. a
+        timeout after the request was sent) is re-raised rather than risk
+        double-inserting rows.
+        """
+        try:
+            session = self.client.postgrest.session
+            response = session.post(
+                table,
+                content=orjson.dumps(rows),
+                headers={"Content-Type": "application/json", "Prefer": "return=minimal"},
+            )
+        except (AttributeError, httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # The request never reached PostgREST (client internals changed,
+            # or the connection was never established) — retrying through the
+            # regular client cannot duplicate rows
+            self.logger.warning(f"orjson insert path failed for {table}, falling back: {e}")
+        else:
+            try:
+                response.raise_for_status()
+                return
+            except httpx.HTTPStatusError as e:
+                # PostgREST answered with an error, so its transaction rolled
+                # back; safe to retry through the regular client path
+                self.logger.warning(f"orjson insert rejected for {table}, falling back: {e}")
+
+        self.client.table(table).insert(rows).execute()
+
+    def insert_document(self, filename: str, storage_path: str, page_count: int, file_size: int, content_hash: Optional[str] = None) -> str:
         """
         Insert document metadata into pdf_documents table.
         Returns: Document ID
@@ -390,13 +704,25 @@ class SupabaseRAGStorage:
                 "page_count": page_count,
                 "file_size": file_size
             }
+            if content_hash:
+                data["content_hash"] = content_hash
 
-            response = self.client.table("pdf_documents").insert(data).execute()
+            try:
+                response = self.client.table("pdf_documents").insert(data).execute()
+            except APIError as e:
+                # Supabase schema might not yet have the content_hash column
+                error_message = getattr(e, "message", str(e))
+                if content_hash and (e.code == "PGRST204" or "schema cache" in error_message.lower()):
+                    self.logger.warning("content_hash column missing, inserting without it: %s", e)
+                    data.pop("content_hash", None)
+                    response = self.client.table("pdf_documents").insert(data).execute()
+                else:
+                    raise
             doc_id = response.data[0]["id"]
-            
+
             self.logger.info(f"Inserted document with ID: {doc_id}")
             return doc_id
-            
+
         except Exception as e:
             self.logger.error(f"Error inserting document: {e}")
             raise
@@ -421,7 +747,7 @@ class SupabaseRAGStorage:
             self.logger.error(f"Error listing documents: {e}")
             raise
     
-    def insert_chunks(self, document_id: str, chunks: List[Dict], embeddings: List[List[float]]) -> int:
+    def insert_chunks(self, document_id: str, chunks: List["Chunk"], embeddings: np.ndarray) -> int:
         """
         Insert chunks with embeddings into pdf_chunks table.
         Returns: Number of chunks inserted
@@ -431,25 +757,28 @@ class SupabaseRAGStorage:
             for chunk, embedding in zip(chunks, embeddings):
                 row = {
                     "document_id": document_id,
-                    "page_number": chunk['page_number'],
-                    "chunk_index": chunk['chunk_index'],
-                    "chunk_text": chunk['text'],
-                    "embedding": embedding,
+                    "page_number": chunk.page_number,
+                    "chunk_index": chunk.chunk_index,
+                    "chunk_text": chunk.text,
+                    "embedding": _as_float_list(embedding),
                     "metadata": {
-                        "char_start": chunk['char_start'],
-                        "char_end": chunk['char_end'],
-                        "text_length": len(chunk['text'])
+                        "char_start": chunk.char_start,
+                        "char_end": chunk.char_end,
+                        "text_length": len(chunk.text)
                     }
                 }
                 rows.append(row)
             
-            # Insert in batches to avoid payload size limits
-            batch_size = 50
+            # Insert in batches to avoid payload size limits. PostgREST is
+            # comfortable with a few thousand rows per call; 500 rows of
+            # ~6KB embedding JSON is ~3MB, well under the limit, and makes
+            # 10x fewer round-trips than the old 50-row batches.
+            batch_size = 500
             total_inserted = 0
             
             for i in range(0, len(rows), batch_size):
                 batch = rows[i:i + batch_size]
-                self.client.table("pdf_chunks").insert(batch).execute()
+                self._insert_rows("pdf_chunks", batch)
                 total_inserted += len(batch)
                 self.logger.debug(f"Inserted batch {i//batch_size + 1}: {len(batch)} chunks")
             
@@ -640,46 +969,94 @@ class SupabaseRAGStorage:
         )
         return contexts
 
-    def search_handwriting_context(
+    def _match_chunks_batched(
         self,
-        frame_ids: List[str],
+        batched_fn: str,
+        single_fn: str,
+        ids_param: str,
+        per_id_count_param: str,
+        single_filter_param: str,
+        ids: List[str],
         query_embedding: List[float],
-        limit_per_note: int = 5,
-        threshold: float = 0.2,
+        threshold: float,
+        limit_per_id: int,
     ) -> List[Dict]:
-        notes = self._get_handwriting_notes(frame_ids)
-        if not notes:
-            return []
+        """Run a match RPC over many parent ids in one round-trip.
 
-        matches: List[Dict] = []
-        for note in notes:
+        Falls back to the original one-RPC-per-id loop when the batched
+        function isn't deployed yet (schema-cache/function-missing APIError).
+        """
+        try:
+            resp = self.client.rpc(
+                batched_fn,
+                {
+                    "query_embedding": _as_float_list(query_embedding),
+                    ids_param: ids,
+                    "match_threshold": threshold,
+                    per_id_count_param: limit_per_id,
+                },
+            ).execute()
+            return resp.data or []
+        except APIError as e:
+            self.logger.warning(
+                "%s unavailable (%s); falling back to per-id %s calls",
+                batched_fn, getattr(e, "message", e), single_fn,
+            )
+
+        rows: List[Dict] = []
+        for item_id in ids:
             try:
                 resp = self.client.rpc(
-                    "match_handwriting_chunks",
+                    single_fn,
                     {
-                        "query_embedding": query_embedding,
+                        "query_embedding": _as_float_list(query_embedding),
                         "match_threshold": threshold,
-                        "match_count": limit_per_note,
-                        "filter_note_id": note["id"],
+                        "match_count": limit_per_id,
+                        single_filter_param: item_id,
                     },
                 ).execute()
             except Exception as e:
-                self.logger.error("Handwriting match RPC failed: %s", e, exc_info=True)
+                self.logger.error("%s RPC failed: %s", single_fn, e, exc_info=True)
                 continue
+            rows.extend(resp.data or [])
+        return rows
 
-            for row in resp.data or []:
-                matches.append(
-                    {
-                        "source_type": "handwriting",
-                        "frame_id": note["frame_id"],
-                        "note_id": note["id"],
-                        "chunk_id": row["id"],
-                        "text": row.get("chunk_text", ""),
-                        "metadata": row.get("metadata") or {},
-                        "similarity": row.get("similarity"),
-                    }
-                )
-        return matches
+    def search_handwriting_context(
+        self,
+        frame_ids: List[str],
+        query_embedding: List[float],
+        limit_per_note: int = 5,
+        threshold: float = 0.2,
+    ) -> List[Dict]:
+        notes = self._get_handwriting_notes(frame_ids)
+        if not notes:
+            return []
+
+        note_lookup = {note["id"]: note["frame_id"] for note in notes}
+        rows = self._match_chunks_batched(
+            "match_handwriting_chunks_for_notes",
+            "match_handwriting_chunks",
+            ids_param="note_ids",
+            per_id_count_param="match_count_per_note",
+            single_filter_param="filter_note_id",
+            ids=list(note_lookup),
+            query_embedding=query_embedding,
+            threshold=threshold,
+            limit_per_id=limit_per_note,
+        )
+
+        return [
+            {
+                "source_type": "handwriting",
+                "frame_id": note_lookup.get(row["note_id"]),
+                "note_id": row["note_id"],
+                "chunk_id": row["id"],
+                "text": row.get("chunk_text", ""),
+                "metadata": row.get("metadata") or {},
+                "similarity": row.get("similarity"),
+            }
+            for row in rows
+        ]
 
     def insert_typed_note(
         self,
@@ -714,7 +1091,7 @@ class SupabaseRAGStorage:
         self,
         note_id: str,
         chunks: List[Dict],
-        embeddings: List[List[float]],
+        embeddings: np.ndarray,
     ) -> int:
         if not chunks:
             self.client.table("typed_note_chunks").delete().eq("note_id", note_id).execute()
@@ -727,7 +1104,7 @@ class SupabaseRAGStorage:
                     "note_id": note_id,
                     "chunk_index": chunk.get("chunk_index", 0),
                     "chunk_text": chunk.get("text", ""),
-                    "embedding": embedding,
+                    "embedding": _as_float_list(embedding),
                     "metadata": chunk.get("metadata", {}),
                 }
             )
@@ -828,47 +1205,39 @@ class SupabaseRAGStorage:
             self.logger.error("Failed to fetch typed notes for search: %s", e, exc_info=True)
             return []
 
+        note_lookup = {note["id"]: note["frame_id"] for note in notes_resp.data or []}
+        rows = self._match_chunks_batched(
+            "match_typed_note_chunks_for_notes",
+            "match_typed_note_chunks",
+            ids_param="note_ids",
+            per_id_count_param="match_count_per_note",
+            single_filter_param="filter_note_id",
+            ids=list(note_lookup),
+            query_embedding=query_embedding,
+            threshold=threshold,
+            limit_per_id=limit_per_note,
+        )
+
         matches: List[Dict] = []
-        for note in notes_resp.data or []:
-            try:
-                resp = self.client.rpc(
-                    "match_typed_note_chunks",
-                    {
-                        "query_embedding": query_embedding,
-                        "match_threshold": threshold,
-                        "match_count": limit_per_note,
-                        "filter_note_id": note["id"],
-                    },
-                ).execute()
-                self.logger.info(
-                    "RPC match_typed_note_chunks for note %s returned %d matches",
-                    note["id"],
-                    len(resp.data or []),
-                )
-            except Exception as e:
-                self.logger.error("Typed note match RPC failed: %s", e, exc_info=True)
-                continue
+        for row in rows:
+            self.logger.debug(
+                "Match: similarity=%.3f, chunk_id=%s, text_preview=%.50s",
+                row.get("similarity", 0),
+                row.get("id"),
+                row.get("chunk_text", "")[:50],
+            )
+            matches.append(
+                {
+                    "source_type": "typed",
+                    "frame_id": note_lookup.get(row["note_id"]),
+                    "note_id": row["note_id"],
+                    "chunk_id": row["id"],
+                    "text": row.get("chunk_text", ""),
+                    "metadata": row.get("metadata") or {},
+                    "similarity": row.get("similarity"),
+                }
+            )
 
-            for row in resp.data or []:
-                similarity = row.get("similarity", 0)
-                self.logger.debug(
-                    "Match: similarity=%.3f, chunk_id=%s, text_preview=%.50s",
-                    similarity,
-                    row.get("id"),
-                    row.get("chunk_text", "")[:50],
-                )
-                matches.append(
-                    {
-                        "source_type": "typed",
-                        "frame_id": note["frame_id"],
-                        "note_id": note["id"],
-                        "chunk_id": row["id"],
-                        "text": row.get("chunk_text", ""),
-                        "metadata": row.get("metadata") or {},
-                        "similarity": row.get("similarity"),
-                    }
-                )
-        
         self.logger.info("search_typed_context: Returning %d total matches", len(matches))
         return matches
 
@@ -885,48 +1254,49 @@ class SupabaseRAGStorage:
         if not links:
             return []
 
+        doc_links: Dict[str, List[Dict]] = {}
+        for link in links:
+            doc_links.setdefault(link["document_id"], []).append(link)
+
         doc_lookup: Dict[str, Dict] = {}
-        doc_ids = list({link["document_id"] for link in links})
-        if doc_ids:
-            try:
-                docs_resp = (
-                    self.client.table("pdf_documents")
-                    .select("id,filename")
-                    .in_("id", doc_ids)
-                    .execute()
-                )
-                for doc in docs_resp.data or []:
-                    doc_lookup[doc["id"]] = doc
-            except Exception as e:
-                self.logger.error("Failed to fetch pdf documents: %s", e, exc_info=True)
+        doc_ids = list(doc_links)
+        try:
+            docs_resp = (
+                self.client.table("pdf_documents")
+                .select("id,filename")
+                .in_("id", doc_ids)
+                .execute()
+            )
+            for doc in docs_resp.data or []:
+                doc_lookup[doc["id"]] = doc
+        except Exception as e:
+            self.logger.error("Failed to fetch pdf documents: %s", e, exc_info=True)
+
+        rows = self._match_chunks_batched(
+            "match_pdf_chunks_for_documents",
+            "match_pdf_chunks",
+            ids_param="document_ids",
+            per_id_count_param="match_count_per_document",
+            single_filter_param="filter_document_id",
+            ids=doc_ids,
+            query_embedding=query_embedding,
+            threshold=threshold,
+            limit_per_id=limit_per_document,
+        )
 
         matches: List[Dict] = []
-        for link in links:
-            try:
-                resp = self.client.rpc(
-                    "match_pdf_chunks",
-                    {
-                        "query_embedding": query_embedding,
-                        "match_threshold": threshold,
-                        "match_count": limit_per_document,
-                        "filter_document_id": link["document_id"],
-                    },
-                ).execute()
-            except Exception as e:
-                self.logger.error("PDF match RPC failed: %s", e, exc_info=True)
-                continue
-
-            for row in resp.data or []:
+        for row in rows:
+            for link in doc_links.get(row["document_id"], []):
                 matches.append(
                     {
                         "source_type": "pdf",
                         "shape_id": link["shape_id"],
-                        "document_id": link["document_id"],
+                        "document_id": row["document_id"],
                         "chunk_id": row["id"],
                         "text": row.get("chunk_text", ""),
                         "metadata": row.get("metadata") or {},
                         "page_number": row.get("page_number"),
-                        "filename": doc_lookup.get(link["document_id"], {}).get("filename"),
+                        "filename": doc_lookup.get(row["document_id"], {}).get("filename"),
                         "similarity": row.get("similarity"),
                     }
                 )
@@ -941,52 +1311,68 @@ class SupabaseRAGStorage:
         typed_limit_per_note: int = 5,
         threshold: float = 0.2,
     ) -> List[Dict]:
-        matches: List[Dict] = []
-        matches.extend(
-            self.search_handwriting_context(
+        # The three source searches hit independent tables, so overlap their
+        # Supabase round-trips instead of paying the sum of the latencies
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            handwriting_future = pool.submit(
+                self.search_handwriting_context,
                 shape_ids, query_embedding, limit_per_note=handwriting_limit_per_note, threshold=threshold
             )
-        )
-        matches.extend(
-            self.search_pdf_context(
+            pdf_future = pool.submit(
+                self.search_pdf_context,
                 shape_ids, query_embedding, limit_per_document=pdf_limit_per_document, threshold=threshold
             )
-        )
-        matches.extend(
-            self.search_typed_context(
+            typed_future = pool.submit(
+                self.search_typed_context,
                 shape_ids, query_embedding, limit_per_note=typed_limit_per_note, threshold=threshold
             )
-        )
+            matches: List[Dict] = []
+            matches.extend(handwriting_future.result())
+            matches.extend(pdf_future.result())
+            matches.extend(typed_future.result())
         # sort by similarity descending if available
         matches.sort(key=lambda x: x.get("similarity", 0), reverse=True)
         return matches
     
     def similarity_search(
-        self, 
-        query_embedding: List[float], 
-        limit: int = 5, 
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
         threshold: float = 0.7,
-        document_id: Optional[str] = None
+        document_id: Optional[str] = None,
+        ef_search: Optional[int] = None
     ) -> List[Dict]:
         """
         Perform similarity search using the match_pdf_chunks function.
+        ef_search tunes the HNSW candidate-list size per query (recall vs
+        latency); None keeps the database default.
         Returns: List of matching chunks with similarity scores
         """
+        params = {
+            "query_embedding": _as_float_list(query_embedding),
+            "match_threshold": threshold,
+            "match_count": limit,
+            "filter_document_id": document_id
+        }
+        if ef_search is not None:
+            params["ef_search"] = ef_search
+
         try:
-            response = self.client.rpc(
-                "match_pdf_chunks",
-                {
-                    "query_embedding": query_embedding,
-                    "match_threshold": threshold,
-                    "match_count": limit,
-                    "filter_document_id": document_id
-                }
-            ).execute()
-            
+            try:
+                response = self.client.rpc("match_pdf_chunks", params).execute()
+            except APIError as e:
+                # The ef_search parameter may not exist yet on older schemas
+                if "ef_search" in params:
+                    self.logger.warning("ef_search parameter rejected, retrying without it: %s", e)
+                    params.pop("ef_search")
+                    response = self.client.rpc("match_pdf_chunks", params).execute()
+                else:
+                    raise
+
             results = response.data
             self.logger.info(f"Found {len(results)} similar chunks")
             return results
-            
+
         except Exception as e:
             self.logger.error(f"Error in similarity search: {e}")
             raise
@@ -994,7 +1380,13 @@ class SupabaseRAGStorage:
 
 class PDFProcessor:
     """Main class coordinating the entire PDF processing pipeline"""
-    
+
+    # Bounded queue between extraction and chunk/embed stages; small so a slow
+    # consumer backpressures the parser instead of buffering the whole document
+    PIPELINE_QUEUE_SIZE = 4
+    # Dispatch an embedding batch once this many chunks have accumulated
+    EMBED_DISPATCH_SIZE = 128
+
     def __init__(self, supabase_url: str, supabase_key: str, openai_key: str, openai_base_url: str = None):
         self.extractor = PDFExtractor()
         self.chunker = TextChunker(chunk_size=1000, overlap=200)
@@ -1010,42 +1402,80 @@ class PDFProcessor:
         try:
             # Get file size
             file_size = os.path.getsize(pdf_path)
-            
-            # Step 1: Extract text
-            self.logger.info("Step 1: Extracting text from PDF...")
-            page_texts = self.extractor.extract_text_by_page(pdf_path)
-            
-            # Step 2: Chunk text
-            self.logger.info("Step 2: Chunking text...")
-            all_chunks = []
-            for page_num, text in page_texts.items():
-                page_chunks = self.chunker.chunk_text(text, page_num)
-                all_chunks.extend(page_chunks)
-            
-            self.logger.info(f"Created {len(all_chunks)} chunks from {len(page_texts)} pages")
-            
-            # Step 3: Generate embeddings
-            self.logger.info("Step 3: Generating embeddings...")
-            chunk_texts = [chunk['text'] for chunk in all_chunks]
-            embeddings = self.embedding_gen.generate_embeddings(chunk_texts)
-            
-            # Step 4: Upload to Supabase
-            self.logger.info("Step 4: Uploading to Supabase...")
-            storage_path = self.storage.upload_pdf_file(pdf_path, filename)
+
+            # Step 0: Skip reprocessing if this exact content was already ingested.
+            # A single hash pass is far cheaper than re-parsing and re-embedding.
+            content_hash = await asyncio.to_thread(self._hash_file, pdf_path)
+            existing = await asyncio.to_thread(self.storage.find_document_by_hash, content_hash)
+            if existing:
+                self.logger.info(
+                    "PDF content already processed as document %s, skipping pipeline", existing["id"]
+                )
+                return {
+                    "document_id": existing["id"],
+                    "filename": existing.get("filename", filename),
+                    "page_count": existing.get("page_count", 0),
+                    "chunk_count": 0,
+                    "file_size": existing.get("file_size", file_size),
+                    "public_url": self.storage.get_public_url(existing["storage_path"]),
+                    "status": "duplicate",
+                }
+
+            # Step 0: Skip image-only (scanned) PDFs before paying for a full parse
+            if not await asyncio.to_thread(self.extractor.is_born_digital, pdf_path):
+                self.logger.warning("PDF %s has no extractable text, skipping chunk/embed steps", filename)
+                return {
+                    "document_id": None,
+                    "filename": filename,
+                    "page_count": 0,
+                    "chunk_count": 0,
+                    "file_size": file_size,
+                    "public_url": None,
+                    "status": "requires_ocr",
+                    "requires_ocr": True,
+                }
+
+            # Steps 1-4 pipelined: pages stream through a bounded queue into the
+            # chunker, embedding batches are dispatched as soon as enough chunks
+            # exist, and the storage upload runs alongside — so the OpenAI API
+            # is busy while later pages are still parsing.
+            self.logger.info("Steps 1-4: Extracting, chunking, embedding, and uploading (pipelined)...")
+            upload_task = asyncio.create_task(
+                asyncio.to_thread(self.storage.upload_pdf_file, pdf_path, filename)
+            )
+
+            try:
+                all_chunks, page_count, embeddings = await self._extract_and_embed(pdf_path)
+                self.logger.info(f"Created {len(all_chunks)} chunks from {page_count} pages")
+
+                storage_path = await upload_task
+            except Exception:
+                # Don't leave the upload running unobserved when extraction
+                # fails: collect its outcome so its exception isn't dropped
+                # as "Task exception was never retrieved"
+                if not upload_task.done():
+                    upload_task.cancel()
+                await asyncio.gather(upload_task, return_exceptions=True)
+                raise
             public_url = self.storage.get_public_url(storage_path)
-            
+
             # Insert document metadata
-            document_id = self.storage.insert_document(filename, storage_path, len(page_texts), file_size)
-            
+            document_id = await asyncio.to_thread(
+                self.storage.insert_document,
+                filename, storage_path, page_count, file_size, content_hash=content_hash
+            )
+
             # Insert chunks with embeddings
-            chunks_inserted = self.storage.insert_chunks(document_id, all_chunks, embeddings)
+            chunks_inserted = await asyncio.to_thread(
+                self.storage.insert_chunks, document_id, all_chunks, embeddings
+            )
             
             self.logger.info("PDF processing completed successfully")
             
             return {
                 "document_id": document_id,
                 "filename": filename,
-                "page_count": len(page_texts),
+                "page_count": page_count,
                 "chunk_count": chunks_inserted,
                 "file_size": file_size,
                 "public_url": public_url,
@@ -1056,6 +1486,84 @@ class PDFProcessor:
             self.logger.error(f"PDF processing failed: {e}", exc_info=True)
             raise
 
+    async def _extract_and_embed(self, pdf_path: str) -> Tuple[List[Chunk], int, np.ndarray]:
+        """
+        Producer/consumer pipeline: a worker thread streams pages through a
+        bounded queue, the consumer chunks them and dispatches embedding
+        batches while extraction is still running.
+        Returns: (all_chunks, page_count, embeddings) with embeddings in chunk order
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+
+        def _produce_pages():
+            try:
+                for item in self.extractor.iter_page_texts(pdf_path):
+                    asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+            finally:
+                asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+        producer = asyncio.create_task(asyncio.to_thread(_produce_pages))
+
+        all_chunks: List[Chunk] = []
+        page_count = 0
+        batch_texts: List[str] = []
+        embed_tasks: List[asyncio.Task] = []
+
+        def _dispatch_batch():
+            if batch_texts:
+                texts = list(batch_texts)
+                batch_texts.clear()
+                embed_tasks.append(asyncio.create_task(
+                    asyncio.to_thread(self.embedding_gen.generate_embeddings, texts)
+                ))
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                page_num, text = item
+                page_count += 1
+                page_chunks = self.chunker.chunk_text(text, page_num)
+                all_chunks.extend(page_chunks)
+                batch_texts.extend(chunk.text for chunk in page_chunks)
+                if len(batch_texts) >= self.EMBED_DISPATCH_SIZE:
+                    _dispatch_batch()
+
+            await producer  # surface extraction errors
+            _dispatch_batch()
+
+            if embed_tasks:
+                embeddings = np.vstack(await asyncio.gather(*embed_tasks))
+            else:
+                embeddings = self.embedding_gen.generate_embeddings([])
+            return all_chunks, page_count, embeddings
+        except BaseException:
+            # The producer thread may be parked on queue.put with the queue
+            # full; keep draining until its sentinel lands so the thread can
+            # exit instead of blocking forever
+            while not producer.done():
+                try:
+                    if await asyncio.wait_for(queue.get(), timeout=0.1) is None:
+                        break
+                except asyncio.TimeoutError:
+                    continue
+            await asyncio.gather(producer, return_exceptions=True)
+            for task in embed_tasks:
+                task.cancel()
+            await asyncio.gather(*embed_tasks, return_exceptions=True)
+            raise
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """SHA-256 fingerprint of the file contents, read in chunks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
 
 class HandwritingProcessor:
     """Process handwriting snapshots: OCR + embeddings + Supabase persistence"""
@@ -1067,8 +1575,12 @@ class HandwritingProcessor:
         self.overlap = overlap
         self.logger = logging.getLogger(__name__ + '.HandwritingProcessor')
 
-    def process_note(self, note_id: str, image_bytes: bytes) -> None:
-        """Run OCR + embedding generation for a handwriting note"""
+    def process_note(self, note_id: str, image_bytes: Union[bytes, memoryview]) -> None:
+        """
+        Run OCR + embedding generation for a handwriting note.
+        Accepts any buffer-protocol object, so callers can hand over a
+        memoryview of the upload instead of copying megabyte PNGs.
+        """
         try:
             self.logger.info(f"Processing handwriting note {note_id}")
             ocr_text, ocr_metadata = self._perform_ocr(image_bytes)
@@ -1105,7 +1617,7 @@ class HandwritingProcessor:
             except Exception:
                 pass
 
-    def _perform_ocr(self, image_bytes: bytes) -> Tuple[str, Dict]:
+    def _perform_ocr(self, image_bytes: Union[bytes, memoryview]) -> Tuple[str, Dict]:
         """Extract text via pytesseract with light preprocessing"""
         image = Image.open(BytesIO(image_bytes))
         grayscale = image.convert("L")
@@ -1,47 +1,142 @@
 from fastapi import (
-    BackgroundTasks,
     FastAPI,
     WebSocket,
     WebSocketDisconnect,
     HTTPException,
     File,
+    Request,
     UploadFile,
     Form,
 )
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import ORJSONResponse
+from sse_starlette.sse import EventSourceResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 # from emergentintegrations.llm.chat import LlmChat, UserMessage
 import os
 # from motor.motor_asyncio import AsyncIOMotorClient
-import json
-import requests
+import hashlib
+import re
+import time
+import httpx
+import orjson
+from io import BytesIO
+from PIL import Image, UnidentifiedImageError
 from datetime import datetime, timezone
 import uuid
-from typing import Dict, List, Set, Optional
-import tempfile
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Set, Optional, Tuple
+from functools import lru_cache
+import numpy as np
+from cachetools import LRUCache, TTLCache
+import aiofiles
+import aiofiles.tempfile
 import logging
+import zlib
 import asyncio
 from dotenv import load_dotenv
+from openai import AsyncOpenAI
 
 # Load environment variables FIRST before importing tools that need them
 load_dotenv()
 
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Environment configuration, read once at import instead of per request."""
+    daily_api_key: Optional[str]
+    thesys_api_key: Optional[str]
+    supabase_url: Optional[str]
+    supabase_service_key: Optional[str]
+    openai_api_key: Optional[str]
+
+
+settings = Settings(
+    daily_api_key=os.getenv("DAILY_API_KEY"),
+    thesys_api_key=os.getenv("THESYS_API_KEY"),
+    supabase_url=os.getenv("SUPABASE_URL"),
+    supabase_service_key=os.getenv("SUPABASE_SERVICE_KEY"),  # service role key for backend
+    openai_api_key=os.getenv("OPENAI_API_KEY"),
+)
+
 from pdf_processor import (
     PDFProcessor,
     EmbeddingGenerator,
     SupabaseRAGStorage,
     HandwritingProcessor,
+    sanitize_filename,
 )
 from system_prompt import SYSTEM_PROMPT
 from image_search_tool import get_image_search_tool
 from embed_tool import get_embed_tool
 
+# Built once: the system message is identical for every /api/ask request
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+class SSEGzipMiddleware:
+    """
+    Streaming-safe gzip for text/event-stream responses.
+
+    Starlette's GZipMiddleware buffers whole responses, which would stall
+    SSE. This wraps the send channel with a per-connection compressor and
+    flushes with Z_SYNC_FLUSH after every frame, so each token is still
+    delivered immediately while markdown/JSON frames compress 3-6x.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = b""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept_encoding = value
+                break
+        if b"gzip" not in accept_encoding:
+            await self.app(scope, receive, send)
+            return
+
+        compressor = None
+
+        async def send_wrapper(message):
+            nonlocal compressor
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = next(
+                    (v for k, v in headers if k.lower() == b"content-type"), b""
+                )
+                if content_type.startswith(b"text/event-stream"):
+                    compressor = zlib.compressobj(wbits=31)  # gzip container
+                    headers = [
+                        (k, v) for k, v in headers
+                        if k.lower() not in (b"content-length", b"content-encoding")
+                    ]
+                    headers.append((b"content-encoding", b"gzip"))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and compressor is not None:
+                body = message.get("body", b"")
+                if message.get("more_body", False):
+                    body = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                else:
+                    body = compressor.compress(body) + compressor.flush()
+                message = {**message, "body": body}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# orjson-backed responses across the board: every JSON payload the API
+# returns is serialized in Rust instead of the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -52,6 +147,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress SSE streams without breaking their flush-per-token behavior
+app.add_middleware(SSEGzipMiddleware)
+
 class PromptRequest(BaseModel):
     prompt: str
     context: str | None = None
@@ -70,6 +168,35 @@ class TypedNoteSyncRequest(BaseModel):
     textShapes: List[TypedNoteShape]
 
 
+# SSE framing helpers. orjson returns bytes, so frames go to the response
+# pre-encoded — no per-token UTF-8 re-encode on the hot streaming path.
+# EventSourceResponse passes raw bytes through untouched and adds 15s ping
+# comments so proxies don't kill idle streams.
+_SSE_DONE = b"data: [DONE]\n\n"
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache, no-transform",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _sse(payload: Dict) -> bytes:
+    """Encode one SSE data frame as bytes."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+# Token frames are by far the hottest SSE path (one per streamed delta), and
+# their only dynamic part is the content string — skip the per-token dict by
+# splicing the escaped string between precomputed frame fragments.
+_SSE_CONTENT_PREFIX = b'data: {"content":'
+_SSE_FRAME_SUFFIX = b"}\n\n"
+
+
+def _sse_content(text: str) -> bytes:
+    """Encode a {"content": ...} SSE frame without building the dict."""
+    return _SSE_CONTENT_PREFIX + orjson.dumps(text) + _SSE_FRAME_SUFFIX
+
+
 def _extract_text_from_richtext(rich_text: Dict) -> str:
     """
     Recursively extract plain text from tldraw's richText structure (ProseMirror format).
@@ -102,13 +229,17 @@ def _extract_text_from_richtext(rich_text: Dict) -> str:
     return ""
 
 
+# Collapses runs of whitespace (including newlines) in one pass instead of
+# strip + replace + split/join over the same string
+_WS_RE = re.compile(r"\s+")
+
+
 def format_selection_context(entries: List[Dict]) -> str:
     if not entries:
         return ""
-    lines = []
+    lines = ["Use the following canvas context when answering:"]
     for idx, entry in enumerate(entries, start=1):
-        snippet = (entry.get("text") or "").strip().replace("\n", " ")
-        snippet = " ".join(snippet.split())
+        snippet = _WS_RE.sub(" ", entry.get("text") or "").strip()
         source_type = entry.get("source_type")
         if source_type == "handwriting":
             label = f"Handwriting frame {entry.get('frame_id')}"
@@ -124,7 +255,7 @@ def format_selection_context(entries: List[Dict]) -> str:
         similarity = entry.get("similarity")
         sim_text = f" [similarity {similarity:.2f}]" if isinstance(similarity, (int, float)) else ""
         lines.append(f"{idx}. {label}{sim_text}: {snippet}")
-    return "Use the following canvas context when answering:\n" + "\n".join(lines)
+    return "\n".join(lines)
 
 @app.get("/")
 async def root():
@@ -138,71 +269,141 @@ async def health_check():
 class VideoRoomRequest(BaseModel):
     room_id: str
 
+# Shared Daily.co HTTP client. One pooled client for all requests keeps
+# connections warm (no per-call TCP/TLS handshake) and avoids blocking the
+# event loop the way per-call sync requests did.
+_daily_client: Optional[httpx.AsyncClient] = None
+
+# Room URLs change rarely, so hot rooms skip the Daily.co round-trip entirely
+# for a few minutes. Per-room locks single-flight concurrent misses so a burst
+# of joins for the same canvas triggers one lookup, not N.
+_room_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+_room_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# Shared Thesys C1 client: a per-request AsyncOpenAI would open a fresh TLS
+# connection to api.thesys.dev on every ask/summary call. One client with a
+# pooled HTTP/2 transport keeps connections warm across streams.
+_thesys_client: Optional[AsyncOpenAI] = None
+
+
+@app.on_event("startup")
+async def _create_http_clients():
+    global _daily_client, _thesys_client
+    api_key = settings.daily_api_key
+    if api_key:
+        _daily_client = httpx.AsyncClient(
+            base_url="https://api.daily.co/v1",
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=30.0,
+            http2=True,
+        )
+    else:
+        logger.warning("DAILY_API_KEY not configured, video room endpoint disabled")
+
+    _thesys_client = AsyncOpenAI(
+        base_url="https://api.thesys.dev/v1/embed",
+        api_key=settings.thesys_api_key,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+            timeout=60.0,
+            http2=True,
+        ),
+    )
+
+    embedding_batcher.start()
+
+    global _ocr_queue
+    _ocr_queue = asyncio.Queue(maxsize=_OCR_QUEUE_SIZE)
+    _ocr_workers.extend(
+        asyncio.create_task(_ocr_worker()) for _ in range(_OCR_WORKER_COUNT)
+    )
+
+
+@app.on_event("shutdown")
+async def _close_http_clients():
+    await embedding_batcher.stop()
+    for worker in _ocr_workers:
+        worker.cancel()
+    await asyncio.gather(*_ocr_workers, return_exceptions=True)
+    _ocr_workers.clear()
+    if _daily_client is not None:
+        await _daily_client.aclose()
+    if _thesys_client is not None:
+        await _thesys_client.close()
+
+
+async def _lookup_or_create_room(room_name: str) -> str:
+    """Resolve a Daily.co room URL, creating the room if it doesn't exist."""
+    # Try to get existing room first
+    get_response = await _daily_client.get(f"/rooms/{room_name}")
+
+    if get_response.status_code == 200:
+        # Room exists
+        room_data = get_response.json()
+        logger.info(f"Found existing Daily.co room: {room_name}")
+        return room_data["url"]
+
+    if get_response.status_code == 404:
+        # Room doesn't exist, create it
+        logger.info(f"Room {room_name} not found, creating new room")
+
+        room_config = {
+            "name": room_name,
+            "properties": {
+                "enable_screenshare": True,
+                "enable_chat": True,
+                "start_video_off": False,
+                "start_audio_off": False,
+                "enable_recording": "cloud"
+            }
+        }
+
+        create_response = await _daily_client.post("/rooms", json=room_config)
+
+        if create_response.status_code in [200, 201]:
+            room_data = create_response.json()
+            logger.info(f"Created new Daily.co room: {room_name}")
+            return room_data["url"]
+
+        logger.error(f"Daily.co API POST error: {create_response.status_code} - {create_response.text}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create Daily.co room: {create_response.text}"
+        )
+
+    # Other error from GET request (e.g., 401, 403, 500)
+    logger.error(f"Daily.co API GET error: {get_response.status_code} - {get_response.text}")
+    raise HTTPException(
+        status_code=500,
+        detail=f"Failed to check Daily.co room: {get_response.text}"
+    )
+
+
 @app.post("/api/video/room")
 async def get_or_create_video_room(request: VideoRoomRequest):
     """Get or create a Daily.co room for the canvas"""
     try:
-        api_key = os.getenv("DAILY_API_KEY")
-        if not api_key:
+        if _daily_client is None:
             raise HTTPException(status_code=500, detail="Daily.co API key not configured")
 
         # Room name based on canvas room ID
         room_name = f"canvas-{request.room_id}"
 
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        # Try to get existing room first
-        get_url = f"https://api.daily.co/v1/rooms/{room_name}"
-        get_response = requests.get(get_url, headers=headers)
-
-        room_url = None
-        if get_response.status_code == 200:
-            # Room exists
-            room_data = get_response.json()
-            room_url = room_data["url"]
-            logger.info(f"Found existing Daily.co room: {room_name}")
-        elif get_response.status_code == 404:
-            # Room doesn't exist, create it
-            logger.info(f"Room {room_name} not found, creating new room")
-
-            create_url = "https://api.daily.co/v1/rooms"
-            room_config = {
-                "name": room_name,
-                "properties": {
-                    "enable_screenshare": True,
-                    "enable_chat": True,
-                    "start_video_off": False,
-                    "start_audio_off": False,
-                    "enable_recording": "cloud"
-                }
-            }
-
-            create_response = requests.post(create_url, headers=headers, json=room_config)
-
-            if create_response.status_code in [200, 201]:
-                room_data = create_response.json()
-                room_url = room_data["url"]
-                logger.info(f"Created new Daily.co room: {room_name}")
-            else:
-                logger.error(f"Daily.co API POST error: {create_response.status_code} - {create_response.text}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to create Daily.co room: {create_response.text}"
-                )
+        room_url = _room_cache.get(room_name)
+        if room_url is None:
+            async with _room_locks[room_name]:
+                # Re-check after acquiring the lock: another waiter may have
+                # resolved the room while we were queued
+                room_url = _room_cache.get(room_name)
+                if room_url is None:
+                    room_url = await _lookup_or_create_room(room_name)
+                    _room_cache[room_name] = room_url
         else:
-            # Other error from GET request (e.g., 401, 403, 500)
-            logger.error(f"Daily.co API GET error: {get_response.status_code} - {get_response.text}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to check Daily.co room: {get_response.text}"
-            )
+            logger.debug(f"Room cache hit for {room_name}")
 
         # Create a meeting token with transcription admin permissions
         logger.info(f"Creating meeting token with transcription permissions for room: {room_name}")
-        token_url = "https://api.daily.co/v1/meeting-tokens"
         token_payload = {
             "properties": {
                 "room_name": room_name,
@@ -211,7 +412,7 @@ async def get_or_create_video_room(request: VideoRoomRequest):
             }
         }
 
-        token_response = requests.post(token_url, headers=headers, json=token_payload)
+        token_response = await _daily_client.post("/meeting-tokens", json=token_payload)
 
         if token_response.status_code in [200, 201]:
             token_data = token_response.json()
@@ -251,26 +452,13 @@ async def generate_instant_summary(request: GenerateSummaryRequest):
         logger.warning("⚠️  Empty transcript provided")
         # Return error as SSE stream
         async def error_stream():
-            yield f"data: {json.dumps({'error': 'Empty transcript'})}\n\n"
-        return StreamingResponse(
-            error_stream(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache, no-transform",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
-        )
+            yield _sse({'error': 'Empty transcript'})
+        return EventSourceResponse(error_stream(), headers=_SSE_HEADERS, ping=15)
 
     async def generate_summary_stream():
         try:
             # Use OpenAI with Thesys C1 for rich UI generation
-            from openai import AsyncOpenAI
-
-            client = AsyncOpenAI(
-                base_url="https://api.thesys.dev/v1/embed",
-                api_key=os.getenv("THESYS_API_KEY")
-            )
+            client = _thesys_client
 
             logger.info("🤖 Sending to Thesys C1 for summary generation...")
 
@@ -282,7 +470,7 @@ async def generate_instant_summary(request: GenerateSummaryRequest):
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "transcriptLength": word_count,
             }
-            yield f"data: {json.dumps({'metadata': metadata})}\n\n"
+            yield _sse({'metadata': metadata})
 
             # Create streaming completion with C1 model
             stream = await client.chat.completions.create(
@@ -320,9 +508,9 @@ Use markdown formatting:
                     if delta.content:
                         full_summary += delta.content
                         # Yield in SSE format
-                        yield f"data: {json.dumps({'content': delta.content})}\n\n"
+                        yield _sse_content(delta.content)
 
-            yield "data: [DONE]\n\n"
+            yield _SSE_DONE
 
             # Store in database asynchronously (don't block the stream)
             asyncio.create_task(store_summary_in_db(
@@ -335,17 +523,9 @@ Use markdown formatting:
 
         except Exception as e:
             logger.error(f"❌ Error generating summary: {e}", exc_info=True)
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-
-    return StreamingResponse(
-        generate_summary_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+            yield _sse({'error': str(e)})
+
+    return EventSourceResponse(generate_summary_stream(), headers=_SSE_HEADERS, ping=15)
 
 
 async def store_summary_in_db(summary: str, transcript: str, room_id: str):
@@ -358,7 +538,9 @@ async def store_summary_in_db(summary: str, transcript: str, room_id: str):
             "status": "completed",
             "generation_method": "realtime_c1"
         }
-        storage.client.table("meeting_summaries").insert(summary_data).execute()
+        await asyncio.to_thread(
+            get_storage().client.table("meeting_summaries").insert(summary_data).execute
+        )
         logger.info("✅ Summary stored in database")
     except Exception as e:
         logger.error(f"❌ Error storing summary: {e}", exc_info=True)
@@ -390,8 +572,8 @@ def parse_tool_arguments(tool_call: Dict) -> Dict:
             return {}
 
         try:
-            return json.loads(arguments)
-        except json.JSONDecodeError as e:
+            return orjson.loads(arguments)
+        except orjson.JSONDecodeError as e:
             # Log the error for debugging
             logger.error(f"Failed to parse tool arguments: {arguments}")
             logger.error(f"Parse error: {e}")
@@ -404,8 +586,6 @@ def parse_tool_arguments(tool_call: Dict) -> Dict:
 @app.post("/api/ask")
 async def ask_stream(request: PromptRequest):
     """Stream Thesys C1 generative UI response"""
-    from openai import AsyncOpenAI
-
     selected_shape_ids = request.shape_ids or []
     selection_context_entries: List[Dict] = []
     selection_context_text = ""
@@ -413,15 +593,31 @@ async def ask_stream(request: PromptRequest):
     if selected_shape_ids:
         logger.info("ask_stream received %d selected shapes: %s", len(selected_shape_ids), selected_shape_ids)
         try:
-            query_embedding = embedding_gen.generate_embeddings([request.prompt])[0]
-            selection_context_entries = storage.search_context_for_shape_ids(
-                selected_shape_ids,
-                query_embedding,
-                handwriting_limit_per_note=5,
-                pdf_limit_per_document=5,
-                typed_limit_per_note=5,
-                threshold=0.1,  # Lower threshold to be more lenient with matches
-            )
+            normalized_prompt = " ".join(request.prompt.lower().split())
+            query_embedding = _query_embed_cache.get(normalized_prompt)
+            if query_embedding is None:
+                query_embedding = await embedding_batcher.embed(request.prompt)
+                _query_embed_cache[normalized_prompt] = query_embedding
+
+            norm = float(np.linalg.norm(query_embedding))
+            q_norm = query_embedding / norm if norm > 0 else query_embedding
+            shapes_key = tuple(sorted(selected_shape_ids))
+
+            cached_entries = _context_cache.lookup(q_norm, shapes_key)
+            if cached_entries is not None:
+                selection_context_entries = cached_entries
+                logger.info("Context cache hit for %d selected shapes", len(selected_shape_ids))
+            else:
+                selection_context_entries = await asyncio.to_thread(
+                    get_storage().search_context_for_shape_ids,
+                    selected_shape_ids,
+                    query_embedding,
+                    handwriting_limit_per_note=5,
+                    pdf_limit_per_document=5,
+                    typed_limit_per_note=5,
+                    threshold=0.1,  # Lower threshold to be more lenient with matches
+                )
+                _context_cache.store(q_norm, shapes_key, selection_context_entries)
             logger.info(
                 "Found %d context entries: %d handwriting, %d pdf, %d typed",
                 len(selection_context_entries),
@@ -433,7 +629,8 @@ async def ask_stream(request: PromptRequest):
                 logger.debug("Context entries preview: %s", selection_context_entries[:2])
         except Exception as e:
             logger.error("Failed generating embeddings or searching context: %s", e, exc_info=True)
-            selection_context_entries = storage.get_context_for_shape_ids(
+            selection_context_entries = await asyncio.to_thread(
+                get_storage().get_context_for_shape_ids,
                 selected_shape_ids,
                 handwriting_limit_per_note=5,
                 pdf_limit_per_document=5,
@@ -448,21 +645,13 @@ async def ask_stream(request: PromptRequest):
     
     async def generate_c1_response():
         try:
-            # Initialize OpenAI client with Thesys base URL
-            client = AsyncOpenAI(
-                base_url="https://api.thesys.dev/v1/embed",
-                api_key=os.getenv("THESYS_API_KEY")
-            )
-            
+            # Shared Thesys client, pooled connections
+            client = _thesys_client
+
             # Get image search tool
             image_tool = get_image_search_tool()
             
-            messages = [
-                {
-                    "role": "system",
-                    "content": SYSTEM_PROMPT
-                }
-            ]
+            messages = [_SYSTEM_MESSAGE]
             
             # Add context BEFORE the user prompt so the AI has it when reading the question
             if request.context:
@@ -500,7 +689,7 @@ async def ask_stream(request: PromptRequest):
             
             # Stream the response
             if selection_context_entries:
-                yield f"data: {json.dumps({'context_entries': selection_context_entries})}\n\n"
+                yield _sse({'context_entries': selection_context_entries})
 
             # Track tool calls
             current_tool_call = None
@@ -527,7 +716,7 @@ async def ask_stream(request: PromptRequest):
                             
                             # Handle regular content
                             if delta.content:
-                                yield f"data: {json.dumps({'content': delta.content})}\n\n"
+                                yield _sse_content(delta.content)
                             
                             # Handle tool calls
                             if delta.tool_calls:
@@ -658,7 +847,7 @@ async def ask_stream(request: PromptRequest):
                                     'thinking': 'Searching for images...',
                                     'description': 'Finding the perfect image for your canvas.'
                                 }
-                                yield f"data: {json.dumps(thinking_data)}\n\n"
+                                yield _sse(thinking_data)
                                 
                                 try:
                                     # Execute the tool
@@ -701,11 +890,11 @@ async def ask_stream(request: PromptRequest):
                                     tool_call_id = None
                 except asyncio.TimeoutError:
                     logger.error("Streaming request timed out after 120 seconds")
-                    yield f"data: {json.dumps({'error': 'Request timed out. Please try again.'})}\n\n"
+                    yield _sse({'error': 'Request timed out. Please try again.'})
                     break
                 except Exception as stream_error:
                     logger.error(f"C1 streaming error: {stream_error}", exc_info=True)
-                    yield f"data: {json.dumps({'error': str(stream_error)})}\n\n"
+                    yield _sse({'error': str(stream_error)})
                     break
                 
                 # After processing the stream, check if we need to continue with tool results
@@ -728,21 +917,13 @@ async def ask_stream(request: PromptRequest):
                     logger.debug("Stream ended without explicit finish_reason")
                     break
             
-            yield "data: [DONE]\n\n"
+            yield _SSE_DONE
             
         except Exception as e:
             logger.error(f"C1 streaming error: {e}", exc_info=True)
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield _sse({'error': str(e)})
     
-    return StreamingResponse(
-        generate_c1_response(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return EventSourceResponse(generate_c1_response(), headers=_SSE_HEADERS, ping=15)
 
 # Pydantic models for embed endpoints
 class CreateEmbedRequest(BaseModel):
@@ -827,16 +1008,94 @@ async def create_embed(request: CreateEmbedRequest):
         logger.error(f"Error creating embed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-# Initialize PDF processor
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")  # Use service role key for backend
-OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+# Initialize PDF processor with the service role key for full permissions
+# Heavy clients are built lazily on first use: each uvicorn worker only pays
+# construction (and the underlying HTTP clients) for the paths it actually
+# serves, and cold start stays cheap under WEB_CONCURRENCY > 1.
+@lru_cache(maxsize=1)
+def get_pdf_processor() -> PDFProcessor:
+    return PDFProcessor(settings.supabase_url, settings.supabase_service_key, settings.openai_api_key, openai_base_url=None)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_gen() -> EmbeddingGenerator:
+    return EmbeddingGenerator(settings.openai_api_key, base_url=None)
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> SupabaseRAGStorage:
+    return SupabaseRAGStorage(settings.supabase_url, settings.supabase_service_key)
 
-# Initialize with service role key for full permissions
-pdf_processor = PDFProcessor(SUPABASE_URL, SUPABASE_SERVICE_KEY, OPENAI_KEY, openai_base_url=None)
-embedding_gen = EmbeddingGenerator(OPENAI_KEY, base_url=None)
-storage = SupabaseRAGStorage(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-handwriting_processor = HandwritingProcessor(storage, embedding_gen)
+
+@lru_cache(maxsize=1)
+def get_handwriting_processor() -> HandwritingProcessor:
+    return HandwritingProcessor(get_storage(), get_embedding_gen())
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-query embedding requests into one API call.
+
+    /api/ask and /api/pdf/search each embed a single string; under concurrent
+    traffic that means one OpenAI round-trip per request. The batcher queues
+    (text, future) pairs, and a background task drains up to MAX_BATCH items
+    arriving within a short window into a single embeddings call, then
+    resolves each waiter's future with its row.
+    """
+
+    MAX_BATCH = 32
+    WINDOW_SECONDS = 0.005
+
+    def __init__(self, generator_factory: Callable[[], EmbeddingGenerator]):
+        self._generator_factory = generator_factory
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.WINDOW_SECONDS
+            while len(batch) < self.MAX_BATCH:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await asyncio.to_thread(self._generator_factory().generate_embeddings, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+
+embedding_batcher = EmbeddingBatcher(get_embedding_gen)
 
 # Pydantic models for PDF endpoints
 class SearchRequest(BaseModel):
@@ -844,6 +1103,8 @@ class SearchRequest(BaseModel):
     limit: int = 10
     threshold: float = 0.7
     document_id: Optional[str] = None
+    # HNSW candidate-list size: lower = faster, higher = better recall
+    ef_search: Optional[int] = None
 
 class SearchResult(BaseModel):
     id: str
@@ -853,39 +1114,58 @@ class SearchResult(BaseModel):
     similarity: float
     metadata: dict
 
+# Uploads are capped at 20MB. Declared sizes are rejected from the
+# Content-Length header before any body bytes are read; the streaming
+# copies still enforce the budget for chunked transfers with no header.
+_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+
+def _reject_oversized(request: Request) -> None:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > _MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+
+
 # PDF Endpoints
 @app.post("/api/pdf/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(request: Request, file: UploadFile = File(...)):
     """
     Upload a PDF file, extract text, generate embeddings, and store in Supabase.
     """
     try:
+        _reject_oversized(request)
+
         # Validate file type
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Validate file size (20MB limit)
-        file.file.seek(0, 2)
-        file_size = file.file.tell()
-        file.file.seek(0)
-        
-        if file_size > 20 * 1024 * 1024:  # 20MB
-            raise HTTPException(status_code=400, detail="File size exceeds 20MB limit")
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
+        # Stream to a temporary file in 1MB pieces instead of reading the
+        # whole upload into RAM first; the 20MB limit is enforced as bytes
+        # arrive so oversized uploads are rejected early. aiofiles keeps the
+        # disk writes off the event-loop thread.
+        temp_path = None
         try:
+            async with aiofiles.tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+                temp_path = temp_file.name
+                total_bytes = 0
+                while chunk := await file.read(1 << 20):
+                    if total_bytes == 0 and not chunk.startswith(b"%PDF-"):
+                        # Extension checks lie; the magic bytes in the first
+                        # chunk don't. Bail before any extraction work.
+                        raise HTTPException(status_code=400, detail="File is not a valid PDF")
+                    total_bytes += len(chunk)
+                    if total_bytes > _MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail="File size exceeds 20MB limit")
+                    await temp_file.write(chunk)
+
             # Process the PDF
-            result = await pdf_processor.process_pdf(temp_path, file.filename)
-            return JSONResponse(content=result, status_code=200)
-            
+            result = await get_pdf_processor().process_pdf(temp_path, file.filename)
+            _invalidate_result_caches()
+            return ORJSONResponse(content=result, status_code=200)
+
         finally:
             # Clean up temp file
-            if os.path.exists(temp_path):
+            if temp_path and os.path.exists(temp_path):
                 os.unlink(temp_path)
     
     except HTTPException:
@@ -908,15 +1188,18 @@ async def upsert_pdf_canvas_link(request: PdfCanvasLinkRequest):
     """
     try:
         # Validate document exists
-        document = storage.get_document(request.documentId)
+        document = await asyncio.to_thread(get_storage().get_document, request.documentId)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
-        link = storage.upsert_pdf_canvas_link(
+        link = await asyncio.to_thread(
+            get_storage().upsert_pdf_canvas_link,
             shape_id=request.shapeId,
             document_id=request.documentId,
             room_id=request.roomId,
         )
+        # A new shape->document link changes what selection context resolves to
+        _context_cache.clear()
         return {"success": True, "link": link}
     except HTTPException:
         raise
@@ -930,13 +1213,13 @@ async def get_document(document_id: str):
     Get document metadata by ID.
     """
     try:
-        document = storage.get_document(document_id)
-        
+        document = await asyncio.to_thread(get_storage().get_document, document_id)
+
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
         # Add public URL
-        public_url = storage.get_public_url(document['storage_path'])
+        public_url = get_storage().get_public_url(document['storage_path'])
         document['public_url'] = public_url
         
         return document
@@ -953,11 +1236,12 @@ async def list_documents(limit: int = 50, offset: int = 0):
     List all documents with pagination.
     """
     try:
-        documents = storage.list_documents(limit, offset)
-        
-        # Add public URLs
+        documents = await asyncio.to_thread(get_storage().list_documents, limit, offset)
+
+        # Public URLs are deterministic, so this loop is pure string
+        # formatting — no network calls
         for doc in documents:
-            doc['public_url'] = storage.get_public_url(doc['storage_path'])
+            doc['public_url'] = get_storage().get_public_url(doc['storage_path'])
         
         return {
             "documents": documents,
@@ -970,36 +1254,197 @@ async def list_documents(limit: int = 50, offset: int = 0):
         logger.error(f"Failed to list documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Two-tier search cache: an exact LRU keyed on the normalized query string
+# avoids the OpenAI embedding call, and a small semantic tier returns stored
+# results for near-duplicate queries (one matmul against cached embeddings)
+# without touching Supabase at all.
+_query_embed_cache: LRUCache = LRUCache(maxsize=4096)
+
+
+class ProximityCache:
+    """Approximate cache keyed by L2-normalized query embeddings.
+
+    Lookup is a single matrix-vector product against the cached embeddings;
+    the best match counts as a hit when its cosine similarity clears the
+    threshold, the non-embedding parameters match exactly, and the entry
+    hasn't outlived its TTL. Oldest entries are evicted once the cache is
+    full, and ingest paths call clear() so new content is never shadowed by
+    stale results.
+    """
+
+    def __init__(self, maxsize: int, threshold: float, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix: Optional[np.ndarray] = None  # (N, D) rows, L2-normalized
+        self._entries: List[Tuple[tuple, list]] = []  # (params key, value)
+        self._expires: List[float] = []
+
+    def lookup(self, q_norm: np.ndarray, params_key: tuple) -> Optional[list]:
+        if self._matrix is None or not self._entries:
+            return None
+        scores = self._matrix @ q_norm
+        best = int(np.argmax(scores))
+        if (
+            scores[best] >= self.threshold
+            and self._entries[best][0] == params_key
+            and time.monotonic() < self._expires[best]
+        ):
+            return self._entries[best][1]
+        return None
+
+    def store(self, q_norm: np.ndarray, params_key: tuple, value: list) -> None:
+        if self._matrix is None:
+            self._matrix = q_norm[None, :]
+        else:
+            self._matrix = np.vstack([self._matrix, q_norm])[-self.maxsize:]
+        self._entries.append((params_key, value))
+        del self._entries[:-self.maxsize]
+        self._expires.append(time.monotonic() + self.ttl)
+        del self._expires[:-self.maxsize]
+
+    def clear(self) -> None:
+        self._matrix = None
+        self._entries.clear()
+        self._expires.clear()
+
+
+_search_semantic_cache = ProximityCache(maxsize=256, threshold=0.92)
+# Selection context is scoped to the selected shapes, so rephrasings of the
+# same question over the same shapes reuse the stored entries. Higher
+# threshold than search: context feeds the LLM directly, so only very close
+# paraphrases should hit.
+_context_cache = ProximityCache(maxsize=128, threshold=0.95)
+
+
+def _invalidate_result_caches() -> None:
+    """Drop cached search/context results after new content is ingested.
+
+    The exact query-embedding LRU stays: embeddings for a given string don't
+    go stale, only the result sets built from them do.
+    """
+    _search_semantic_cache.clear()
+    _context_cache.clear()
+
+
 @app.post("/api/pdf/search")
 async def search_pdfs(request: SearchRequest):
     """
     Perform semantic search on PDF chunks.
     """
     try:
-        # Generate embedding for query
-        query_embedding = embedding_gen.generate_embeddings([request.query])[0]
-        
-        # Search
-        results = storage.similarity_search(
-            query_embedding=query_embedding,
-            limit=request.limit,
-            threshold=request.threshold,
-            document_id=request.document_id
-        )
-        
+        normalized_query = " ".join(request.query.lower().split())
+        # Scale the HNSW candidate budget with the requested result count when
+        # the caller doesn't pin it explicitly
+        ef_search = request.ef_search if request.ef_search is not None else max(40, request.limit * 4)
+        params_key = (request.limit, request.threshold, request.document_id, ef_search)
+
+        # Tier 1: exact query match skips the OpenAI round-trip
+        query_embedding = _query_embed_cache.get(normalized_query)
+        if query_embedding is None:
+            query_embedding = await embedding_batcher.embed(request.query)
+            _query_embed_cache[normalized_query] = query_embedding
+
+        # Tier 2: near-duplicate queries reuse stored results
+        norm = float(np.linalg.norm(query_embedding))
+        q_norm = query_embedding / norm if norm > 0 else query_embedding
+        results = _search_semantic_cache.lookup(q_norm, params_key)
+
+        if results is None:
+            results = await asyncio.to_thread(
+                get_storage().similarity_search,
+                query_embedding=query_embedding,
+                limit=request.limit,
+                threshold=request.threshold,
+                document_id=request.document_id,
+                ef_search=ef_search
+            )
+            _search_semantic_cache.store(q_norm, params_key, results)
+        else:
+            logger.info("Semantic cache hit for query: %s", request.query)
+
         return {
             "query": request.query,
             "results": results,
             "count": len(results)
         }
-        
+
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Single-flight OCR per frame: users re-snapshot the same frame rapidly while
+# drawing, and each upload used to queue its own expensive OCR pass. A newer
+# upload cancels the queued task for the stale snapshot (marking its already
+# inserted note row superseded so it doesn't sit in "processing" forever),
+# and a short debounce lets bursts of strokes collapse into one OCR run.
+# Surviving jobs land on a bounded queue drained by a small worker pool, so
+# burst uploads can't run unbounded concurrent OCR against OpenAI/Supabase.
+_ocr_tasks: Dict[str, Tuple[asyncio.Task, str]] = {}  # frame_id -> (task, note_id)
+_ocr_cleanup_tasks: Set[asyncio.Task] = set()
+_OCR_DEBOUNCE_SECONDS = 1.0
+_OCR_QUEUE_SIZE = 64
+_OCR_WORKER_COUNT = 4
+_ocr_queue: Optional[asyncio.Queue] = None
+_ocr_workers: List[asyncio.Task] = []
+
+
+async def _ocr_worker() -> None:
+    while True:
+        note_id, image_bytes = await _ocr_queue.get()
+        try:
+            await asyncio.to_thread(get_handwriting_processor().process_note, note_id, image_bytes)
+            _invalidate_result_caches()
+        except Exception as e:
+            logger.error("OCR worker failed for note %s: %s", note_id, e, exc_info=True)
+        finally:
+            _ocr_queue.task_done()
+
+
+async def _mark_note_superseded(note_id: str) -> None:
+    try:
+        await asyncio.to_thread(
+            get_storage().update_handwriting_note, note_id, {"status": "superseded"}
+        )
+    except Exception as e:
+        logger.error("Failed to mark handwriting note %s superseded: %s", note_id, e)
+
+
+async def _run_ocr_debounced(frame_id: str, note_id: str, image_bytes: bytes | memoryview):
+    try:
+        await asyncio.sleep(_OCR_DEBOUNCE_SECONDS)
+        # Blocks when the queue is full, so a flood of snapshots backpressures
+        # instead of piling up concurrent OCR runs
+        await _ocr_queue.put((note_id, image_bytes))
+    except asyncio.CancelledError:
+        logger.info("OCR for frame %s superseded by a newer upload", frame_id)
+        raise
+    finally:
+        entry = _ocr_tasks.get(frame_id)
+        if entry is not None and entry[0] is asyncio.current_task():
+            _ocr_tasks.pop(frame_id, None)
+
+
+def _schedule_ocr(frame_id: str, note_id: str, image_bytes: bytes | memoryview) -> None:
+    prior = _ocr_tasks.get(frame_id)
+    if prior is not None:
+        prior_task, prior_note_id = prior
+        if not prior_task.done():
+            prior_task.cancel()
+            # The superseded snapshot's note was inserted as "processing" and
+            # its OCR will never run; record that so it doesn't linger
+            cleanup = asyncio.create_task(_mark_note_superseded(prior_note_id))
+            _ocr_cleanup_tasks.add(cleanup)
+            cleanup.add_done_callback(_ocr_cleanup_tasks.discard)
+    _ocr_tasks[frame_id] = (
+        asyncio.create_task(_run_ocr_debounced(frame_id, note_id, image_bytes)),
+        note_id,
+    )
+
+
 @app.post("/api/handwriting-upload")
 async def upload_handwriting_image(
-    background_tasks: BackgroundTasks,
+    request: Request,
     file: UploadFile = File(...),
     frameId: Optional[str] = Form(None),
     timestamp: Optional[str] = Form(None),
@@ -1010,6 +1455,8 @@ async def upload_handwriting_image(
 ):
     """Upload handwriting frame image, store in Supabase, and trigger OCR pipeline."""
     try:
+        _reject_oversized(request)
+
         logger.info(
             "Handwriting upload request received frameId=%s filename=%s content_type=%s",
             frameId,
@@ -1020,31 +1467,57 @@ async def upload_handwriting_image(
         if file.content_type not in ("image/png", "image/jpeg", "image/jpg"):
             raise HTTPException(status_code=400, detail="Only PNG or JPG images are allowed")
 
-        image_bytes = await file.read()
+        # Cap the actual read: chunked uploads carry no Content-Length, so the
+        # header check above can't see them
+        image_bytes = await file.read(_MAX_UPLOAD_BYTES + 1)
+        if len(image_bytes) > _MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="File size exceeds 20MB limit")
         if not image_bytes:
             raise HTTPException(status_code=400, detail="Uploaded image is empty")
 
+        # Validate and fingerprint off the event loop: a malformed snapshot is
+        # rejected before any storage/OCR work, and identical re-uploads are
+        # answered from the existing note without re-running the pipeline
+        def _validate_and_hash() -> str:
+            Image.open(BytesIO(image_bytes)).verify()
+            return hashlib.sha256(image_bytes).hexdigest()
+
+        try:
+            content_hash = await asyncio.to_thread(_validate_and_hash)
+        except (UnidentifiedImageError, OSError):
+            raise HTTPException(status_code=400, detail="Uploaded file is not a valid image")
+
+        existing = await asyncio.to_thread(get_storage().find_handwriting_note_by_hash, content_hash)
+        if existing:
+            logger.info(
+                "Handwriting image already uploaded as note %s, skipping OCR", existing["id"]
+            )
+            return {
+                "success": True,
+                "note_id": existing["id"],
+                "frameId": existing.get("frame_id", frameId),
+                "storage_path": existing["storage_path"],
+                "public_url": get_storage().get_public_url(
+                    existing["storage_path"], bucket=get_storage().handwriting_bucket
+                ),
+                "status": "duplicate",
+            }
+
         normalized_frame_id = frameId or str(uuid.uuid4())
         filename = f"{normalized_frame_id}.png"
 
-        storage_path = storage.upload_handwriting_image(
-            image_bytes=image_bytes,
-            filename=filename,
-            content_type=file.content_type or "image/png",
-        )
-
         bounds_payload = None
         if bounds:
             try:
-                bounds_payload = json.loads(bounds)
-            except json.JSONDecodeError:
+                bounds_payload = orjson.loads(bounds)
+            except orjson.JSONDecodeError:
                 logger.warning("Invalid bounds payload for frame %s: %s", normalized_frame_id, bounds)
 
         stroke_ids = None
         if handwritingShapeIds:
             try:
-                stroke_ids = json.loads(handwritingShapeIds)
-            except json.JSONDecodeError:
+                stroke_ids = orjson.loads(handwritingShapeIds)
+            except orjson.JSONDecodeError:
                 logger.warning(
                     "Invalid handwritingShapeIds payload for frame %s: %s",
                     normalized_frame_id,
@@ -1052,24 +1525,41 @@ async def upload_handwriting_image(
                 )
 
         metadata = {"timestamp": timestamp} if timestamp else {}
+
+        # The storage path is deterministic, so the object upload and the
+        # metadata insert don't depend on each other — run both network
+        # calls concurrently in worker threads
+        storage_path = f"{uuid.uuid4()}/{sanitize_filename(filename)}"
         try:
-            note_id = storage.insert_handwriting_note(
-                frame_id=normalized_frame_id,
-                storage_path=storage_path,
-                room_id=roomId,
-                stroke_ids=stroke_ids,
-                page_bounds=bounds_payload,
-                group_id=groupId,
-                metadata=metadata,
-                status="processing",
+            _, note_id = await asyncio.gather(
+                asyncio.to_thread(
+                    get_storage().upload_handwriting_image,
+                    image_bytes=image_bytes,
+                    filename=filename,
+                    content_type=file.content_type or "image/png",
+                    storage_path=storage_path,
+                ),
+                asyncio.to_thread(
+                    get_storage().insert_handwriting_note,
+                    frame_id=normalized_frame_id,
+                    storage_path=storage_path,
+                    room_id=roomId,
+                    stroke_ids=stroke_ids,
+                    page_bounds=bounds_payload,
+                    group_id=groupId,
+                    metadata=metadata,
+                    status="processing",
+                    content_hash=content_hash,
+                ),
             )
         except Exception as e:
-            logger.error("Failed to insert handwriting note metadata: %s", e, exc_info=True)
+            logger.error("Failed to store handwriting upload: %s", e, exc_info=True)
             raise HTTPException(status_code=500, detail="Failed to store handwriting metadata")
 
-        background_tasks.add_task(handwriting_processor.process_note, note_id, image_bytes)
+        # memoryview avoids copying the image buffer into the OCR task
+        _schedule_ocr(normalized_frame_id, note_id, memoryview(image_bytes))
 
-        public_url = storage.get_public_url(storage_path, bucket=storage.handwriting_bucket)
+        public_url = get_storage().get_public_url(storage_path, bucket=get_storage().handwriting_bucket)
 
         return {
             "success": True,
@@ -1160,7 +1650,8 @@ async def sync_typed_note(request: TypedNoteSyncRequest):
                     rich_text_content,
                 )
 
-        note_id = storage.insert_typed_note(
+        note_id = await asyncio.to_thread(
+            get_storage().insert_typed_note,
             frame_id=request.frameId,
             room_id=request.roomId,
             page_bounds=request.bounds,
@@ -1170,7 +1661,7 @@ async def sync_typed_note(request: TypedNoteSyncRequest):
 
         embeddings = []
         if chunk_texts:
-            embeddings = embedding_gen.generate_embeddings(chunk_texts)
+            embeddings = await asyncio.to_thread(get_embedding_gen().generate_embeddings, chunk_texts)
         else:
             logger.warning(
                 "Typed note sync for frame %s contained %d shapes but no embed-able text",
@@ -1197,7 +1688,8 @@ async def sync_typed_note(request: TypedNoteSyncRequest):
                 }
             )
 
-        storage.replace_typed_note_chunks(note_id, chunks_payload, embeddings)
+        await asyncio.to_thread(get_storage().replace_typed_note_chunks, note_id, chunks_payload, embeddings)
+        _invalidate_result_caches()
 
         return {
             "success": True,
@@ -1213,4 +1705,15 @@ async def sync_typed_note(request: TypedNoteSyncRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
+    # uvloop + httptools for production throughput; set RELOAD=1 for the
+    # dev auto-reloader (single process, stdlib loop)
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        workers=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        reload=bool(int(os.getenv("RELOAD", "0"))),
+    )